@@ -1,31 +1,290 @@
 
-import math
+import argparse
 import random
-import pygame
+import time
+from array import array
+import numpy as np
 import simpy
-
-
-# Define the Cargo class (which will also be used for passengers)
-class Cargo:
-    def __init__(self, env, group, destination, size=1):
-        # Current simulation environment
-        self.env = env
-        # Type of cargo: passenger or cargo
-        self.group = group
-        # Where the cargo needs to be delivered: airport object
-        self.destination = destination
+import simpy.rt
+from event_log import (DISABLED, EventLog, SPAWN, BOARD, DEPLANE, TAKEOFF, LAND, REFUEL,
+                       RUNWAY_WAIT, REJECT, GATE_WAIT, PASSENGER, CARGO, DEBUG, WARNING)
+from fleet import FleetState
+from metrics import Metrics, DISABLED as METRICS_DISABLED
+from network import AirportNetwork
+from profiler import Profiler
+from snapshot import load_snapshot, restore_snapshot, save_snapshot, snapshot_rng
+from scenario import load_scenario
+from spatial import SpatialGrid
+from stream import StateServer
+from trajectory import TrajectoryRecorder
+
+# pygame is only loaded when a GUI is attached, so headless runs never import it
+pygame = None
+
+
+def load_pygame():
+    global pygame
+    if pygame is None:
+        import pygame
+    return pygame
+
+
+# Runway scheduling policies, the priority of a plane asking for a runway (lower goes first)
+# Planes with the same priority use the runway in the order they asked for it
+# Airports use 'fifo' unless their scenario entry asks for another policy with runway_policy
+RUNWAY_POLICIES = {
+    'fifo': lambda p, landing: 0,
+    # Planes that have waited the least so far go first, so one late plane does not delay the others
+    'fewest_delay': lambda p, landing: p.delay(),
+    'most_delay': lambda p, landing: -p.delay(),
+    'landings_first': lambda p, landing: 0 if landing else 1,
+}
+
+
+# Define the ItemPool class, the storage of every passenger and cargo item of a simulation.
+# Items are integer handles into parallel arrays, so a waiting item costs a few bytes instead of an object
+class ItemPool:
+    def __init__(self):
+        # Type of item: PASSENGER or CARGO
+        self.group = array('B')
+        # Where the item needs to be delivered: index of the airport in the network
+        self.destination = array('i')
         # How many cargo slots does the item take (4 out of 80 capacity for one object)
-        # Default value is 1 for passengers
-        self.size = size
+        # Always 1 for passengers
+        self.size = array('B')
+        # Simulation time the item appeared at its airport
+        self.spawn_time = array('d')
+        # Handles of delivered items, reused by the next spawned items
+        self.free = array('i')
+
+    def __len__(self):
+        # Number of items alive
+        return len(self.group) - len(self.free)
+
+    def new(self, group, destination, size, spawn_time):
+        if self.free:
+            h = self.free.pop()
+            self.group[h] = group
+            self.destination[h] = destination
+            self.size[h] = size
+            self.spawn_time[h] = spawn_time
+            return h
+        self.group.append(group)
+        self.destination.append(destination)
+        self.size.append(size)
+        self.spawn_time.append(spawn_time)
+        return len(self.group) - 1
+
+    def release(self, handles):
+        # The items have been delivered
+        self.free.extend(handles)
+
+    def total_size(self, handles):
+        size = self.size
+        return sum(size[h] for h in handles)
+
+    def total_spawn_time(self, handles):
+        spawn_time = self.spawn_time
+        return sum(spawn_time[h] for h in handles)
+
+
+# Define the HandleQueue class, a first in first out queue of item handles
+class HandleQueue:
+    __slots__ = ('items', 'head')
+
+    def __init__(self):
+        self.items = array('i')
+        # Position of the oldest item, everything before it has already left
+        self.head = 0
+
+    def __len__(self):
+        return len(self.items) - self.head
+
+    def peek(self):
+        return self.items[self.head]
+
+    def popleft(self):
+        h = self.items[self.head]
+        self.head += 1
+        self.compact()
+        return h
+
+    def take(self, n):
+        # Remove the n oldest handles in one slice
+        handles = self.items[self.head:self.head+n]
+        self.head += n
+        self.compact()
+        return handles
+
+    def compact(self):
+        if self.head > 1024 and 2 * self.head > len(self.items):
+            del self.items[:self.head]
+            self.head = 0
+
+
+# Define the CargoQueue class, waiting cargo or passengers grouped by destination airport
+class CargoQueue:
+    def __init__(self, pool):
+        # Storage the handles in this queue point into
+        self.pool = pool
+        # Items waiting for each destination, in arrival order
+        # {airport: HandleQueue}
+        self.by_destination = {}
+        # Number of items in the queue
+        self.count = 0
+        # Total size of the items in the queue
+        self.space = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, destination, h, size):
+        queue = self.by_destination.get(destination)
+        if queue is None:
+            queue = self.by_destination[destination] = HandleQueue()
+        queue.items.append(h)
+        self.count += 1
+        self.space += size
+
+    def extend(self, destination, handles, space):
+        queue = self.by_destination.get(destination)
+        if queue is None:
+            queue = self.by_destination[destination] = HandleQueue()
+        queue.items.extend(handles)
+        self.count += len(handles)
+        self.space += space
+
+    def waiting(self, destination):
+        # Number of items waiting for this destination
+        queue = self.by_destination.get(destination)
+        return len(queue) if queue is not None else 0
+
+    def peek(self, destination):
+        # Oldest item waiting for this destination
+        return self.by_destination[destination].peek()
+
+    def popleft(self, destination):
+        # Remove the oldest item waiting for this destination
+        h = self.by_destination[destination].popleft()
+        self.count -= 1
+        self.space -= self.pool.size[h]
+        return h
+
+    def take(self, destination, n):
+        # Remove the n oldest items waiting for this destination, returns (handles, their total size)
+        handles = self.by_destination[destination].take(n)
+        space = self.pool.total_size(handles)
+        self.count -= n
+        self.space -= space
+        return handles, space
+
+    def pop_destination(self, destination):
+        # Remove every item waiting for this destination
+        queue = self.by_destination.pop(destination, None)
+        if queue is None:
+            return array('i')
+        handles = queue.items[queue.head:]
+        self.count -= len(handles)
+        self.space -= self.pool.total_size(handles)
+        return handles
+
+    def contents(self):
+        # (destination, handles oldest first) for every destination with items waiting
+        for destination, queue in self.by_destination.items():
+            if len(queue):
+                yield destination, queue.items[queue.head:]
+
+
+# Define the CargoIndex class, waiting cargo of an airport indexed by destination and size.
+# Every (destination, size) bucket is a queue in arrival order, so the oldest item of each size is at
+# its head and a plane is loaded by looking at a handful of bucket heads instead of every waiting item
+class CargoIndex:
+    def __init__(self, pool):
+        # Storage the handles in this index point into
+        self.pool = pool
+        # {airport: {size: HandleQueue}}
+        self.by_destination = {}
+        # Number of items in the index
+        self.count = 0
+        # Total size of the items in the index
+        self.space = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, destination, h, size):
+        buckets = self.by_destination.get(destination)
+        if buckets is None:
+            buckets = self.by_destination[destination] = {}
+        queue = buckets.get(size)
+        if queue is None:
+            queue = buckets[size] = HandleQueue()
+        queue.items.append(h)
+        self.count += 1
+        self.space += size
+
+    def extend(self, destination, handles, space):
+        size = self.pool.size
+        for h in handles:
+            self.append(destination, h, size[h])
+
+    def waiting(self, destination):
+        # Number of items waiting for this destination
+        buckets = self.by_destination.get(destination)
+        return sum(len(queue) for queue in buckets.values()) if buckets is not None else 0
+
+    def load(self, destinations, space):
+        # Pick the items for a hold with space free, going to any of destinations
+        # The oldest item goes first while it fits, once it does not the largest item that still fits
+        # goes (the oldest of that size), which fills the hold as tightly as the waiting sizes allow
+        # Returns {destination: [handles, their total size]}
+        spawn_time = self.pool.spawn_time
+        heads = [(destination, size, queue) for destination in destinations
+                 for size, queue in self.by_destination.get(destination, {}).items() if len(queue)]
+        loaded = {}
+        while heads and space > 0:
+            oldest = min(heads, key=lambda head: spawn_time[head[2].peek()])
+            if oldest[1] > space:
+                fits = [head for head in heads if head[1] <= space]
+                if not fits:
+                    break
+                oldest = max(fits, key=lambda head: (head[1], -spawn_time[head[2].peek()]))
+            destination, size, queue = oldest
+            h = queue.popleft()
+            if not len(queue):
+                heads.remove(oldest)
+            entry = loaded.get(destination)
+            if entry is None:
+                entry = loaded[destination] = [array('i'), 0]
+            entry[0].append(h)
+            entry[1] += size
+            space -= size
+            self.count -= 1
+            self.space -= size
+        return loaded
+
+    def contents(self):
+        # (destination, handles) for every destination with items waiting, oldest first within a size
+        for destination, buckets in self.by_destination.items():
+            handles = array('i')
+            for queue in buckets.values():
+                handles.extend(queue.items[queue.head:])
+            if handles:
+                yield destination, handles
 
 
 # Define the Plane class
 class Plane:
-    def __init__(self, env, gui, name, speed, passenger_capacity, cargo_capacity):
+    def __init__(self, env, name, speed, passenger_capacity, cargo_capacity, log=None, rng=None, pool=None,
+                 metrics=None):
         # Current simulation environment
         self.env = env
-        # Current pygame environment
-        self.gui = gui
+        # Structured event log, disabled unless one is given
+        self.log = log or DISABLED
+        # Random number stream, the global random module unless a seeded random.Random is given
+        self.rng = rng or random
+        # KPI instruments, disabled unless a Metrics registry is given
+        self.metrics = metrics or METRICS_DISABLED
         # Name of the plane
         self.name = name
         # Speed of the plane
@@ -34,10 +293,12 @@ class Plane:
         self.passenger_capacity = passenger_capacity
         # Max number of cargo that can board the plane
         self.cargo_capacity = cargo_capacity
-        # Number of passengers on the plane
-        self.passengers = []
-        # Number of cargo on the plane
-        self.cargo = []
+        # Storage of the passenger and cargo items, shared by every airport and plane of the simulation
+        self.pool = pool if pool is not None else ItemPool()
+        # Passengers on the plane, grouped by destination
+        self.passengers = CargoQueue(self.pool)
+        # Cargo on the plane, grouped by destination
+        self.cargo = CargoQueue(self.pool)
         # Current space of cargo that are in the plane
         self.cargo_space = 0
         # Is a list of airport objects that the plane travels through.
@@ -46,131 +307,226 @@ class Plane:
         # Airport that the plane is heading towards [referencing the index of route]
         # Define in setup
         self.destination = 0
-        # Holds the Runway Resource
+        # Airports still ahead of the plane before it turns back, used for boarding
+        # Kept as an ordered set (dict keys) so boarding goes to the nearest stop first
+        self.remaining_route = {}
+        # Holds the runway request, for a takeoff or a landing
         self.runway = None
-        # Holds the plane object for the gui
-        self.plane = {}
-        # Holds the plane name object for the gui
-        self.plane_name = {}
-
-    def land(self, a):
-        # Wait for permission to land
-        yield self.env.timeout(1)
-
-        # Land the plane
-        print(f'{self.env.now:.2f}: {self.name} has arrived at {a.name}')
-        yield self.env.timeout(1)
-
-    def takeoff(self, a):
-        # Wait for permission to take off
-        yield self.env.timeout(1)
-
-        # Take off
-        print(f'{self.env.now:.2f}: {self.name} has departed from {a.name} to {self.route[self.destination].name}')
-        yield self.env.timeout(1)
-
-    def travel(self):
-        self.plane = {
-            'type': "circle",
-            'color': self.gui.color['BLACK'],
-            'coords': self.route[self.destination-1].location.copy(),
-            'size': 10
-        }
-        self.plane_name = {
-            'type': "font",
-            'name': self.name,
-            'color': self.gui.color['BLACK'],
-            'coords': self.route[self.destination-1].location.copy()
-        }
-
-        self.gui.dynamic_objects.append(self.plane)
-        self.gui.dynamic_objects.append(self.plane_name)
-
-
-        #Calculate the time it takes to travel
-        dx = self.route[self.destination].location[0] - self.route[self.destination-1].location[0]
-        dy = self.route[self.destination].location[1] \
-             - self.route[self.destination-1].location[1]
-
-        distance = math.sqrt(dx**2 + dy**2)
-        travel_time = distance / self.speed
-
-        # Move the plane to the destination airport
-        print(f'distance to travel is {distance:.2f}')
-        print(f'time to travel is {travel_time:.2f}')
-        print(f'speed of travel is {self.speed:.2f}')
-
-        vx = self.speed * math.cos(math.atan2(dy, dx))
-        vy = self.speed * math.sin(math.atan2(dy, dx))
+        # Simulation time the plane asked for the runway
+        self.runway_requested = 0
+        # Holds the gate request while the plane is on the ground
+        self.gate = None
+        # Simulation time the plane asked for a gate, and the service there started
+        self.gate_requested = 0
+        self.service_start = None
+        # Service processes of the current gate visit, by name, None while not being serviced
+        self.services = None
+        # The simulation process running the plane (see run)
+        self.process = None
+        # True while the plane is in the air between two airports
+        self.flying = False
+        # Step of the turnaround the plane is in (see run), and when that step ends
+        # phase_end is None for steps that wait on an event instead of a fixed time
+        self.phase = 'arriving'
+        self.phase_end = None
+        # Fleet state store holding the current leg, and the slot of this plane in it
+        # Define in setup
+        self.fleet = None
+        self.fleet_index = None
+        # Airport network index used to look up travel times
+        # Define in setup
+        self.network = None
+        # Total time spent queueing for a runway, and how many times the plane queued
+        self.runway_wait = 0
+        self.runway_requests = 0
+        # Total time spent queueing for a gate, and how many times the plane queued
+        self.gate_wait = 0
+        self.gate_requests = 0
+        # Time lost queueing for runways and gates, part of the model state since the runway policies
+        # order planes by it, so unlike the counters above it is always kept when resuming a snapshot
+        self.total_delay = 0
+        # Number of departures, and the share of the seats and cargo hold used summed over them
+        self.departures = 0
+        self.passenger_load = 0.0
+        self.cargo_load = 0.0
+        # Simulation time the plane arrived at its current airport
+        self.arrival_time = 0
+        # Share of the seats and cargo hold used on each departure, and time queued for a runway
+        self.passenger_load_factor = self.metrics.histogram(f'plane.{name}.passenger_load_factor')
+        self.cargo_load_factor = self.metrics.histogram(f'plane.{name}.cargo_load_factor')
+        self.runway_wait_time = self.metrics.histogram('runway_wait')
+
+    def set_destination(self, destination):
+        self.destination = destination
+        self.remaining_route = dict.fromkeys(self.route[destination:])
 
-        for i in range(math.floor(travel_time)):
-            print(f"x {self.plane['coords'][0]}, y {self.plane['coords'][1]}")
-            self.plane['coords'][0] += vx
-            self.plane_name['coords'][0] += vx
-            self.plane['coords'][1] += vy
-            self.plane_name['coords'][1] += vy
-            yield self.env.timeout(1)
-        self.gui.dynamic_objects.remove(self.plane)
-        self.gui.dynamic_objects.remove(self.plane_name)
+    def delay(self):
+        # Minutes lost queueing for runways and gates so far
+        return self.total_delay
 
-    def run(self):
-        while True:
-            pygame.event.get()
-            self.gui.pygame_update()
+    def set_phase(self, phase, duration):
+        self.phase = phase
+        self.phase_end = self.env.now + duration if duration is not None else None
 
+    def next_phase(self):
+        # Finish the current phase and start the next one
+        airport = self.route[self.destination-1]
+        if self.phase == 'arriving':
+            # ------------------------------------------------------Plane reaches airport
+            # request and wait for a gate
+            airport.arrive(self)
+            self.gate = airport.gates.request()
+            self.gate_requested = self.env.now
+            self.set_phase('gate_queued', None)
+
+        elif self.phase == 'gate_queued':
+            # At the gate, the airport services the plane
+            waited = self.env.now - self.gate_requested
+            self.gate_wait += waited
+            self.gate_requests += 1
+            self.total_delay += waited
+            airport.gate_occupancy.set(airport.gates.count)
+            self.log.record(GATE_WAIT, self, airport, waited)
+            self.service_start = self.env.now
+            self.set_phase('servicing', None)
+
+        elif self.phase == 'servicing':
+            # Serviced, leave the gate and queue for takeoff
+            self.service_start = None
+            self.services = None
+            airport.turnaround_time.observe(self.env.now - self.arrival_time)
+            airport.gates.release(self.gate)
+            self.gate = None
+            airport.gate_occupancy.set(airport.gates.count)
+            self.request_runway(airport, False)
+            self.set_phase('queued', None)
+
+        elif self.phase == 'queued':
             # ------------------------------------------------------Plane leaves airport
-            # request and wait for resource
-            self.route[self.destination-1].current_planes.append(self)
-            self.runway = self.route[self.destination-1].runway.request()
-            yield self.runway
-            yield self.env.timeout(1)
-            yield self.env.process(self.takeoff(self.route[self.destination-1]))
-
+            self.runway_granted(airport)
+            airport.depart(self)
+            # A plane without seats or a cargo hold counts as flying it empty
+            passenger_load = len(self.passengers) / self.passenger_capacity if self.passenger_capacity else 0.0
+            cargo_load = self.cargo_space / self.cargo_capacity if self.cargo_capacity else 0.0
+            self.departures += 1
+            self.passenger_load += passenger_load
+            self.cargo_load += cargo_load
+            self.passenger_load_factor.observe(passenger_load)
+            self.cargo_load_factor.observe(cargo_load)
+            self.set_phase('lineup', 1)
+
+        elif self.phase == 'lineup':
+            # Wait for permission to take off
+            self.set_phase('takeoff_clearance', 1)
+
+        elif self.phase == 'takeoff_clearance':
+            # Take off
+            self.log.record(TAKEOFF, self, airport)
+            self.set_phase('takeoff', 1)
+
+        elif self.phase == 'takeoff':
             # Release the runway resource
-            yield self.route[self.destination-1].runway.release(self.runway)
+            airport.runway.release(self.runway)
             self.runway = None
 
             # ------------------------------------------------------Plane is flying
-            yield self.env.process(self.travel())
-
-            # ------------------------------------------------------Plane reaches airport
-            yield self.env.process(self.land(self.route[self.destination]))
-
-            # Plane route and the current location
-            print(self.name, end=' route < ')
-            for i in range(len(self.route)):
-                if i == self.destination:
-                    print("'"+str(self.route[i].name)+"'", end=' ')
-                else:
-                    print(self.route[i].name, end=' ')
-            print(">")
-
+            # The time it takes to travel comes from the precomputed network matrices
+            target = self.route[self.destination]
+            travel_time = self.network.travel_time(airport, target, self.speed)
+            # The whole leg is a single event, the position in between is interpolated on demand
+            self.fleet.depart(self.fleet_index, airport.location, target.location, self.env.now, travel_time)
+            self.flying = True
+            self.set_phase('flying', travel_time)
+
+        elif self.phase == 'flying':
+            # Hold over the target until one of its runways is free
+            self.flying = False
+            self.fleet.land(self.fleet_index)
+            self.request_runway(self.route[self.destination], True)
+            self.set_phase('landing_queued', None)
+
+        elif self.phase == 'landing_queued':
+            # Wait for permission to land
+            self.runway_granted(self.route[self.destination])
+            self.set_phase('landing_clearance', 1)
+
+        elif self.phase == 'landing_clearance':
+            # Land the plane
+            self.log.record(LAND, self, self.route[self.destination])
+            self.set_phase('landing', 1)
+
+        elif self.phase == 'landing':
+            # Off the runway
+            self.route[self.destination].runway.release(self.runway)
+            self.runway = None
             # If we reach the end of our route then we must turn back, and in turn we reverse the list
             if self.destination+1 > len(self.route)-1:
                 self.route.reverse()
-                self.destination = 1
+                self.set_destination(1)
             else:
-                self.destination += 1
-
-
-
+                self.set_destination(self.destination + 1)
+            self.set_phase('arriving', None)
+
+    def request_runway(self, airport, landing):
+        # Queue for a runway of the airport, ordered by its scheduling policy
+        self.runway = airport.runway.request(priority=airport.runway_priority(self, landing))
+        self.runway_requested = self.env.now
+        airport.runway_queue_length.add(1)
+
+    def runway_granted(self, airport):
+        waited = self.env.now - self.runway_requested
+        airport.runway_queue_length.add(-1)
+        self.runway_wait += waited
+        self.runway_requests += 1
+        self.total_delay += waited
+        self.runway_wait_time.observe(waited)
+        self.log.record(RUNWAY_WAIT, self, airport, waited)
+
+    def run(self, phase='arriving', phase_end=None):
+        # The plane goes through its phases in a loop:
+        # arriving -> gate_queued -> servicing -> queued -> lineup -> takeoff_clearance -> takeoff -> flying
+        # -> landing_queued -> landing_clearance -> landing
+        # A plane restored from a snapshot starts in the phase it was saved in
+        self.phase = phase
+        self.phase_end = phase_end
+        while True:
+            if self.phase in ('queued', 'landing_queued'):
+                yield self.runway
+            elif self.phase == 'gate_queued':
+                yield self.gate
+            elif self.phase == 'servicing':
+                # A plane restored in the middle of its service only finishes what was left
+                airport = self.route[self.destination-1]
+                yield self.env.process(airport.wait_for_service(self, self.service_start))
+            elif self.phase_end is not None:
+                yield self.env.timeout(self.phase_end - self.env.now)
+            self.next_phase()
 
 
 # Define the Airport class
 class Airport:
-    def __init__(self, env, gui, name, location, refuel_time, cargo_service_time, cargo_capacity,
-                 passenger_service_time, passenger_capacity):
+    def __init__(self, env, name, location, refuel_time, cargo_service_time, cargo_capacity,
+                 passenger_service_time, passenger_capacity, passenger_rate=0.1, cargo_rate=0.1,
+                 destination_rates=None, gates=1, runways=1, runway_policy='fifo', log=None, rng=None,
+                 pool=None, metrics=None):
         # Current simulation environment
         self.env = env
-        # Current pygame environment
-        self.gui = gui
+        # Structured event log, disabled unless one is given
+        self.log = log or DISABLED
+        # Random number stream, the global random module unless a seeded random.Random is given
+        self.rng = rng or random
+        # KPI instruments, disabled unless a Metrics registry is given
+        self.metrics = metrics or METRICS_DISABLED
         # Name of the airport
         self.name = name
         # Absolute location on the pygame map
         self.location = location
-        # planes that are currently in the airport
-        # [plane, plane2, plane3]
-        self.current_planes = []
+        # Row of the airport in the network matrices
+        # Define in setup
+        self.index = None
+        # planes that are currently on the ground at the airport, at a gate or waiting for one or a runway
+        # Kept as an ordered set (dict keys) so a departing plane is removed without copying the others
+        self.current_planes = {}
         # Time it takes to refuel a plane
         # 15 - 20 min
         self.refuel_time = refuel_time
@@ -184,152 +540,271 @@ class Airport:
         self.passenger_service_time = passenger_service_time
         # Maximum number of people that can be in the airport
         self.passenger_capacity = passenger_capacity
-        # Current cargo that is in the airport
-        self.cargo = []
+        # Storage of the passenger and cargo items, shared by every airport and plane of the simulation
+        self.pool = pool if pool is not None else ItemPool()
+        # Current cargo that is in the airport, grouped by destination and size
+        self.cargo = CargoIndex(self.pool)
         # Current space of cargo that are in the airport
         self.cargo_space = 0
-        # Current number of people that are in the airport
-        self.passengers = []
-        # Prevents the plane from leaving until it acquires this resource
-        self.runway = simpy.Resource(env, capacity=1)
-        self.runway_value = self.runway.request()
-        # To prevent infinite requests for the runway, we will only request if this value is false
-        self.runway_queue = True
+        # Current people that are in the airport, grouped by destination
+        self.passengers = CargoQueue(self.pool)
+        # Planes are serviced at a gate, as many at once as there are gates
+        self.gates = simpy.Resource(env, capacity=gates)
+        # Takeoffs and landings hold a runway, the queue is ordered by the runway policy
+        if runway_policy not in RUNWAY_POLICIES:
+            raise ValueError(f'Unknown runway policy {runway_policy!r}, use one of {", ".join(RUNWAY_POLICIES)}')
+        self.runway = simpy.PriorityResource(env, capacity=runways)
+        self.runway_policy = runway_policy
+        self.runway_priority = RUNWAY_POLICIES[runway_policy]
         # A list of all the other airports
         self.all_airports = []
+        # Expected number of passengers and cargo spawned per time unit, destinations are picked at random
+        self.passenger_rate = passenger_rate
+        self.cargo_rate = cargo_rate
+        # Optional demand per destination, replaces the rates above
+        # {airport: (passenger_rate, cargo_rate)}
+        self.destination_rates = destination_rates
+        # When each demand process spawns its next item, {(group, destination or None): time}
+        self.next_arrivals = {}
+        # The demand processes, {(group, destination or None): process}
+        self.arrival_processes = {}
+        # Items delivered to this airport
+        self.delivered_passengers = 0
+        self.delivered_cargo = 0
+        # Passengers that boarded here, and the total time they waited before boarding
+        self.boarded_passengers = 0
+        self.passenger_wait = 0
+        # Planes queueing for a runway and gates in use, weighted by time
+        self.runway_queue_length = self.metrics.gauge(f'airport.{name}.runway_queue')
+        self.gate_occupancy = self.metrics.gauge(f'airport.{name}.gate_occupancy')
+        # Time from a plane landing here until it is ready for departure
+        self.turnaround_time = self.metrics.histogram(f'airport.{name}.turnaround')
+        # Time from an item spawning until it is delivered, over the whole network
+        self.passenger_latency = self.metrics.histogram('delivery_latency.passenger')
+        self.cargo_latency = self.metrics.histogram('delivery_latency.cargo')
 
     #plane does not have a fuel value, it is assumed the plane will never have 0% and plane refuel time
-    def refuel(self, p):
+    def refuel(self, p, delay):
         # Refuel the plane
-        yield self.env.timeout(self.refuel_time)
-        print(f'{self.env.now:.2f}: {p.name} is fully refueled')
+        yield self.env.timeout(delay)
+        self.log.record(REFUEL, p, self, self.refuel_time)
 
-    def service_passengers(self, p):
+    def service_passengers(self, p, delay):
         # Service the passengers on the plane
         # Remove passengers from plane
-        yield self.env.timeout(self.passenger_service_time)
-        departed_passengers = 0
-        for passenger in p.passengers:
-            if passenger.destination == p.route[p.destination-1]:
-                p.passengers.remove(passenger)
-                del passenger
-                departed_passengers += 1
-        print(f'{env.now:.2f}: {p.name} delivered {departed_passengers} passengers')
-
-        # Load passengers onto plane
+        yield self.env.timeout(delay)
+        departed = p.passengers.pop_destination(self)
+        if self.metrics.enabled:
+            spawn_time = self.pool.spawn_time
+            self.passenger_latency.observe_many(self.env.now - spawn_time[h] for h in departed)
+        self.pool.release(departed)
+        departed_passengers = len(departed)
+        self.delivered_passengers += departed_passengers
+        self.log.record(DEPLANE, p, self, departed_passengers, PASSENGER)
+
+        # Load passengers onto plane, only the ones going somewhere the plane is still heading
         embarked_passengers = 0
-        for passenger in self.passengers:
-            if passenger.destination in p.route:
-                if len(p.passengers) < p.passenger_capacity:
-                    p.passengers.append(passenger)
-                    self.passengers.remove(passenger)
-                    embarked_passengers += 1
-                else:
-                    print(f'{env.now:.2f}: Passengers with destination "{passenger.destination.name}" cannot board the full {p.name}')
-        print(f'{env.now:.2f}: {p.name} boarded {embarked_passengers} passengers')
-
-        print(f'{self.env.now:.2f}: {p.name} has {len(p.passengers)}/{p.passenger_capacity} passengers')
-
-    def service_cargo(self, p):
+        for destination in p.remaining_route:
+            waiting = self.passengers.waiting(destination)
+            n = min(waiting, p.passenger_capacity - len(p.passengers))
+            if n > 0:
+                # Every passenger for this destination boards as one slice of handles
+                boarded, space = self.passengers.take(destination, n)
+                p.passengers.extend(destination, boarded, space)
+                self.passenger_wait += n * self.env.now - self.pool.total_spawn_time(boarded)
+                embarked_passengers += n
+            if waiting > n:
+                self.log.record(REJECT, p, destination, waiting - n, PASSENGER, DEBUG)
+        self.boarded_passengers += embarked_passengers
+        self.log.record(BOARD, p, self, embarked_passengers, PASSENGER)
+
+    def service_cargo(self, p, delay):
         # Service the cargo on the plane
         # Remove cargo from plane
-        yield self.env.timeout(self.cargo_service_time)
-        departed_cargo = 0
-        for cargo in p.cargo:
-            if cargo.destination == p.route[p.destination-1]:
-                p.cargo.remove(cargo)
-                p.cargo_space -= cargo.size
-                del cargo
-                departed_cargo += 1
-        print(f'{env.now:.2f}: {p.name} delivered {departed_cargo} cargo')
-
-        # Load cargo onto plane
+        yield self.env.timeout(delay)
+        departed = p.cargo.pop_destination(self)
+        if self.metrics.enabled:
+            spawn_time = self.pool.spawn_time
+            self.cargo_latency.observe_many(self.env.now - spawn_time[h] for h in departed)
+        self.pool.release(departed)
+        departed_cargo = len(departed)
+        self.delivered_cargo += departed_cargo
+        p.cargo_space = p.cargo.space
+        self.log.record(DEPLANE, p, self, departed_cargo, CARGO)
+
+        # Load cargo onto plane, oldest first for every destination the plane is still heading to
         embarked_cargo = 0
-        for cargo in self.cargo:
-            if cargo.destination in p.route:
-                if cargo.size + p.cargo_space <= p.cargo_capacity:
-                    p.cargo.append(cargo)
-                    self.cargo.remove(cargo)
-                    p.cargo_space += cargo.size
-                    self.cargo_space -= cargo.size
-                    embarked_cargo += 1
-                else:
-                    print(f'{env.now:.2f}: Cargo with destination "{cargo.destination.name}" is too large to fit on {p.name}')
-        print(f'{env.now:.2f}: {p.name} loaded {embarked_cargo} cargo')
-
-        print(f'{self.env.now:.2f}: {p.name} has {p.cargo_space}/{p.cargo_capacity} cargo')
-
-    def wait_for_service(self, p):
+        loaded = self.cargo.load(p.remaining_route, p.cargo_capacity - p.cargo_space)
+        for destination, (handles, space) in loaded.items():
+            p.cargo.extend(destination, handles, space)
+            p.cargo_space += space
+            self.cargo_space -= space
+            embarked_cargo += len(handles)
+        for destination in p.remaining_route:
+            waiting = self.cargo.waiting(destination)
+            if waiting:
+                self.log.record(REJECT, p, destination, waiting, CARGO, DEBUG)
+        self.log.record(BOARD, p, self, embarked_cargo, CARGO)
+
+    def service_steps(self):
+        # (service, duration) of everything done to a plane at the gate
+        return ((self.refuel, self.refuel_time),
+                (self.service_passengers, self.passenger_service_time),
+                (self.service_cargo, self.cargo_service_time))
+
+    def wait_for_service(self, p, started=None):
         # Wait for all services to complete
-        services = [
-            self.env.process(self.refuel(p)),
-            self.env.process(self.service_passengers(p)),
-            self.env.process(self.service_cargo(p))]
-        yield self.env.timeout(1)
-        yield simpy.AllOf(self.env, services)
-
-    def run(self):
+        # A plane restored from a snapshot passes the original start, its unfinished services are
+        # already running (see restore_snapshot)
+        if started is None:
+            started = self.env.now
+        if p.services is None:
+            p.services = {service.__name__: self.env.process(service(p, started + duration - self.env.now))
+                          for service, duration in self.service_steps()}
+        yield self.env.timeout(max(started + 1 - self.env.now, 0))
+        yield simpy.AllOf(self.env, list(p.services.values()))
+
+    def arrive(self, p):
+        # A plane has landed and waits for a gate
+        p.arrival_time = self.env.now
+        self.current_planes[p] = None
+
+    def depart(self, p):
+        # A plane has been given a runway to take off from
+        del self.current_planes[p]
+
+    def spawn(self, group, d):
+        if group == 'passenger':
+            if len(self.passengers) >= self.passenger_capacity:
+                self.log.record(REJECT, self, d, 1, PASSENGER, WARNING)
+            else:
+                self.passengers.append(d, self.pool.new(PASSENGER, d.index, 1, self.env.now), 1)
+                self.log.record(SPAWN, self, d, 1, PASSENGER)
+        else:
+            s = self.rng.randint(1, 5)
+            if self.cargo_space + s > self.cargo_capacity:
+                self.log.record(REJECT, self, d, s, CARGO, WARNING)
+            else:
+                self.cargo.append(d, self.pool.new(CARGO, d.index, s, self.env.now), s)
+                self.cargo_space += s
+                self.log.record(SPAWN, self, d, s, CARGO)
+
+    def arrivals(self, group, rate, destination=None, first=None):
+        # Poisson arrivals: exponential time between two items
+        # first is the time of the next arrival when the process is restored from a snapshot
+        key = (group, destination)
         while True:
-            self.gui.pygame_update()
-            yield self.env.timeout(1)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    exit()
-
-            # Chance event to Generate Cargo at the airport
-            if random.random() <= 0.1:
-                for i in range(random.randint(1, 3)):
-                    d = random.choice(self.all_airports)
-                    if random.choice(['passenger', 'cargo']) == 'passenger':
-                        if len(self.passengers) >= self.passenger_capacity:
-                            print(f'{self.env.now:.2f}: {self.name} can not receive anymore passengers.')
-                        else:
-                            c = Cargo(self.env, 'passenger', d)
-                            self.passengers.append(c)
-                            print(f'{self.env.now:.2f}: Passenger spawned at {self.name}, with the destination {d.name}')
-                    else:
-                        s = random.randint(1, 5)
-                        if self.cargo_space + s > self.cargo_capacity:
-                            print(f'{self.env.now:.2f}: {self.name} can not receive anymore cargo.')
-                        else:
-                            c = Cargo(self.env, 'cargo', d, s)
-                            self.cargo.append(c)
-                            self.cargo_space += s
-                            print(f'{self.env.now:.2f}: Cargo has spawned at {self.name}, with the destination {d.name}. '
-                                  f'Capacity: {self.cargo_space}/{self.cargo_capacity}')
-
-            # Occupy or withold the runway resource.
-            if not self.runway_queue: # if runway_queue is false, then queue up, else dont
-                self.runway_value = self.runway.request()
-                self.runway_queue = True
-
-            if len(self.current_planes) > 0:
-                # There is a plane at the airport that needs to be serviced
-                p = self.current_planes[0]
-
-                yield self.env.process(self.wait_for_service(p))
-
-                print(f'{self.env.now:.2f}: {p.name} is ready for departure')
-
-                self.runway_queue = False
-                yield self.runway.release(self.runway_value)
-
-                self.current_planes = self.current_planes[1:]
+            if first is None:
+                self.next_arrivals[key] = self.env.now + self.rng.expovariate(rate)
             else:
-                # There are no planes at the airport, so wait for one to arrive
-                yield self.env.timeout(1)
-
-
+                self.next_arrivals[key] = first
+                first = None
+            yield self.env.timeout(self.next_arrivals[key] - self.env.now)
+            self.spawn(group, destination or self.rng.choice(self.all_airports))
+
+    def demand(self):
+        # (group, destination or None, rate) of every demand process, one per group or one per group and destination
+        if self.destination_rates is None:
+            rates = [(None, self.passenger_rate, self.cargo_rate)]
+        else:
+            rates = [(d, r[0], r[1]) for d, r in self.destination_rates.items()]
+        return [(group, d, rate) for d, passenger_rate, cargo_rate in rates
+                for group, rate in (('passenger', passenger_rate), ('cargo', cargo_rate)) if rate > 0]
+
+    def start_arrival(self, group, destination, rate, first=None):
+        # first is the pending arrival time of an airport restored from a snapshot
+        self.arrival_processes[(group, destination)] = self.env.process(self.arrivals(group, rate, destination, first))
+
+    def start_arrivals(self):
+        # Create the demand processes
+        for group, d, rate in self.demand():
+            self.start_arrival(group, d, rate)
+
+
+# Define the InteractiveEnvironment class, a non strict real time clock the GUI can speed up, slow down,
+# fast forward and pause. Falling behind never raises, the simulation just catches up as fast as it can
+class InteractiveEnvironment(simpy.rt.RealtimeEnvironment):
+    def __init__(self, initial_time=0, factor=0.5):
+        super().__init__(initial_time, factor, strict=False)
+        # Wall clock seconds per simulation time unit chosen by the user, factor is 0 while fast forwarding
+        self.base_factor = factor
+        self.fast_forward = False
+
+    def sync(self):
+        # Pace from here on, without catching up or waiting for what came before
+        # (RealtimeEnvironment.sync only moves the wall clock start, which is not enough once the factor changes)
+        self.env_start = self.now
+        self.real_start = time.monotonic()
+
+    def set_factor(self, factor):
+        self.base_factor = factor
+        if not self.fast_forward:
+            self._factor = factor
+        self.sync()
+
+    def toggle_fast_forward(self):
+        self.fast_forward = not self.fast_forward
+        self._factor = 0 if self.fast_forward else self.base_factor
+        self.sync()
+
+
+# Define the GUI class, an optional observer that only reads the simulation state
 class GUI:
-    def __init__(self, env):
+    # Width of the airport legend on the right and height of the plane legend at the bottom
+    legend_width = 200
+    legend_height = 100
+    # Airport and plane names are only drawn while at most this many of them are in view
+    label_limit = 60
+
+    def __init__(self, env, frame_rate=10, size=(700, 600)):
+        load_pygame()
         self.env = env
+        # Window size in pixels, the map is what the legends leave free
+        self.size = size
+        self.map_rect = None
         self.screen = None
         self.font = None
         self.const_objects = []
-        self.dynamic_objects = []
         self.airports = []
         self.planes = []
+        # Fleet state store the plane positions are read from
+        self.fleet = None
+        # Number of frames drawn per wall clock second by the render process
+        self.frame_rate = frame_rate
+        # Static objects drawn once, frames are blitted on top of this surface
+        self.background = None
+        # Rendered text surfaces, {key: (text, surface)}, re-rendered only when the text changes
+        self.text_cache = {}
+        # What was blitted last frame, {key: (surface, rect)}
+        self.sprites = {}
+        # Surface used for every plane in the air
+        self.plane_surface = None
+        # True while the user holds the simulation
+        self.paused = False
+        # Frames drawn and skipped, the wall clock time of the last frame drawn and when the next one is due
+        self.frames = 0
+        self.dropped = 0
+        self.last_frame = None
+        self.next_frame = None
+        # Simulation time units and frames per wall clock second, measured over about a second
+        self.sim_speed = None
+        self.fps = None
+        self.measure_start = None
+        # Camera: pixels per world unit, and the world point at the top left corner of the map
+        self.zoom = 1.0
+        self.offset = [0.0, 0.0]
+        # Set when the camera moved, the background is redrawn before the next frame
+        self.camera_moved = False
+        # Mouse position a map drag started from, None while not dragging
+        self.dragging = None
+        # Grid index over the airport locations, they never move so it is built once
+        self.airport_grid = None
+        # Airports inside the view, in network order, and the plane of every fleet slot
+        self.visible_airports = []
+        self.slot_planes = []
+        # Legend page shown, airports and planes in view are listed a page at a time
+        self.airport_page = 0
+        self.plane_page = 0
 
         self.color = {
             'BLACK': (0, 0, 0),
@@ -351,183 +826,615 @@ class GUI:
             'NAVY': (0, 0, 128)
         }
 
-    def pygame_start(self, Airports, Planes):
+    def pygame_start(self, Airports, Planes, fleet):
         self.airports = Airports
         self.planes = Planes
+        self.fleet = fleet
         # Initialize pygame
         pygame.init()
 
         # Set up window
-        self.screen = pygame.display.set_mode((700, 600))
+        self.screen = pygame.display.set_mode(self.size)
         pygame.display.set_caption('Airport Simulation')
+        width, height = self.size
+        self.map_rect = pygame.Rect(0, 0, width - self.legend_width, height - self.legend_height)
 
         # Define font
         self.font = pygame.font.SysFont('Arial', 16)
 
-        # Draw airports
-        for i, airport in enumerate(self.airports):
-            # Generate a random color for this airport
-
-            # Draw circle for airport
-            self.const_objects.append({
-                'type': "circle",
-                'color': self.color['WHITE'],
-                'coords': airport.location.copy(),
-                'size': 20
-            })
-
-            pygame.draw.circle(self.screen, self.color['WHITE'], airport.location, 20)
-
-            # Render airport name text
-            self.const_objects.append({
-                'type': "font",
-                'name': airport.name,
-                'color': self.color['WHITE'],
-                'coords': airport.location.copy(),
-                'size': 20
-            })
-
-            self.const_objects.append({
-                'type': "rectangle",
-                'color': self.color['BROWN'],
-                'coords': [500, 0, 200, 500]
-            })
-            self.const_objects.append({
-                'type': "rectangle",
-                'color': self.color['DARK_BROWN'],
-                'coords': [0, 500, 700, 100]
-            })
+        # Legend panels
+        self.const_objects.append({
+            'type': "rectangle",
+            'color': self.color['BROWN'],
+            'coords': [self.map_rect.width, 0, self.legend_width, self.map_rect.height]
+        })
+        self.const_objects.append({
+            'type': "rectangle",
+            'color': self.color['DARK_BROWN'],
+            'coords': [0, self.map_rect.height, width, self.legend_height]
+        })
 
         # Render airport stats text
         self.const_objects.append({
             'type': "airport_legend",
             'color': self.color['WHITE'],
-            'coords': [600, 50]
+            'coords': [self.map_rect.width + self.legend_width // 2, 20]
         })
 
         # Render plane stats text
         self.const_objects.append({
             'type': "plane_legend",
             'color': self.color['WHITE'],
-            'coords': [100, 520]
+            'coords': [100, self.map_rect.height + 20]
         })
 
+        # Airports never move, their grid is built once with about 32 cells across the network
+        locations = np.array([airport.location for airport in self.airports], dtype=float).reshape(-1, 2)
+        extent = float(np.ptp(locations, axis=0).max()) if len(locations) else 0
+        self.airport_grid = SpatialGrid(max(extent / 32, 1)).build(locations)
+        self.slot_planes = [None] * (max((p.fleet_index for p in self.planes), default=-1) + 1)
+        for p in self.planes:
+            self.slot_planes[p.fleet_index] = p
+        # Networks drawn for the original window keep its one pixel per unit, others are fitted in
+        if len(locations) and not (locations.min() >= 20 and locations[:, 0].max() <= self.map_rect.width - 20
+                                   and locations[:, 1].max() <= self.map_rect.height - 20):
+            self.fit_camera()
+
+        self.plane_surface = pygame.Surface((20, 20), pygame.SRCALPHA)
+        pygame.draw.circle(self.plane_surface, self.color['BLACK'], (10, 10), 10)
+
+        self.redraw_background()
+
+    def fit_camera(self):
+        # Zoom and pan so every airport is in view
+        locations = np.array([airport.location for airport in self.airports], dtype=float)
+        low, high = locations.min(axis=0), locations.max(axis=0)
+        span = np.maximum(high - low, 1)
+        self.zoom = float(min((self.map_rect.width - 60) / span[0], (self.map_rect.height - 60) / span[1]))
+        center = (low + high) / 2
+        self.offset = [float(center[0]) - self.map_rect.width / 2 / self.zoom,
+                       float(center[1]) - self.map_rect.height / 2 / self.zoom]
+        self.camera_moved = True
+
+    def zoom_at(self, factor, screen_point):
+        # Zoom keeping the world point under screen_point where it is
+        x, y = self.to_world(screen_point)
+        self.zoom = min(max(self.zoom * factor, 1e-3), 1e3)
+        self.offset = [x - (screen_point[0] - self.map_rect.left) / self.zoom,
+                       y - (screen_point[1] - self.map_rect.top) / self.zoom]
+        self.camera_moved = True
+
+    def to_screen(self, point):
+        return (self.map_rect.left + (point[0] - self.offset[0]) * self.zoom,
+                self.map_rect.top + (point[1] - self.offset[1]) * self.zoom)
+
+    def to_world(self, point):
+        return (self.offset[0] + (point[0] - self.map_rect.left) / self.zoom,
+                self.offset[1] + (point[1] - self.map_rect.top) / self.zoom)
+
+    def view(self, margin=0):
+        # World rectangle (x0, y0, x1, y1) shown on the map, grown by margin pixels on every side
+        x0, y0 = self.to_world((self.map_rect.left - margin, self.map_rect.top - margin))
+        x1, y1 = self.to_world((self.map_rect.right + margin, self.map_rect.bottom + margin))
+        return x0, y0, x1, y1
+
+    def redraw_background(self):
+        # The map only changes with the camera, airports in view are drawn once into the background
+        radius = min(max(20 * self.zoom, 3), 20)
+        self.visible_airports = sorted(self.airport_grid.query(*self.view(radius)).tolist())
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill(self.color['OLIVE'])
+        self.background.set_clip(self.map_rect)
+        for i in self.visible_airports:
+            airport = self.airports[i]
+            x, y = self.to_screen(airport.location)
+            # Draw circle for airport
+            pygame.draw.circle(self.background, self.color['WHITE'], (x, y), radius)
+            # Render airport name text
+            if len(self.visible_airports) <= self.label_limit:
+                name_surface = self.text((airport.name, 'label'), airport.name, self.color['WHITE'])
+                name_rect = name_surface.get_rect()
+                name_rect.center = x, y + radius + 10
+                self.background.blit(name_surface, name_rect)
+        self.background.set_clip(None)
+        for object in self.const_objects:
+            if object['type'] == 'rectangle':
+                pygame.draw.rect(self.background, object['color'], pygame.Rect(object['coords'][0], object['coords'][1], object['coords'][2], object['coords'][3]))
+
+        # Everything is drawn again on top of the new background
+        self.camera_moved = False
+        self.sprites = {}
+        self.screen.blit(self.background, (0, 0))
         pygame.display.update()
 
-    def pygame_update(self):
-        self.screen.fill(self.color['OLIVE'])
+    def text(self, key, text, color):
+        # Return the surface for this piece of text, rendering it only if the text changed
+        cached = self.text_cache.get(key)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        surface = self.font.render(text, True, color)
+        self.text_cache[key] = (text, surface)
+        return surface
+
+    def airport_stats(self, a):
+        # (planes on the ground, cargo space used, passengers waiting) shown in the airport legend
+        return len(a.current_planes), a.cargo_space, len(a.passengers)
+
+    def plane_stats(self, p):
+        # (route, airport the plane is at or last left, cargo space used, passengers) shown in the plane legend
+        return p.route, p.route[p.destination-1], p.cargo_space, len(p.passengers)
+
+    def status_text(self):
+        # Clock line at the top of the map, None draws nothing
+        if self.sim_speed is None:
+            return None
+        env = self.env
+        if self.paused:
+            state = 'paused'
+        elif getattr(env, 'fast_forward', False):
+            state = 'fast forward'
+        else:
+            state = f'x{1 / getattr(env, "base_factor", 1):g}'
+        return (f'time {env.now:.1f}  {state}  achieved {self.sim_speed:.1f}/s  '
+                f'{self.fps:.0f} fps  {self.dropped} dropped')
+
+    def fleet_positions(self):
+        # Position of every fleet slot, and whether it is in the air
+        positions, headings, remaining, airborne = self.fleet.step(self.env.now)
+        return positions, airborne
+
+    def frame_sprites(self):
+        # Everything that can change between frames, {key: (surface, rect)}
+        # Only airports and planes in view get sprites and legend entries
+        sprites = {}
+
+        def place(key, surface, center):
+            rect = surface.get_rect()
+            rect.center = center
+            sprites[key] = (surface, rect)
+
+        # Planes move every frame, so they are found with one vectorised bounds test over the whole fleet:
+        # O(fleet size) numpy work, like the position update before it, only the planes in view cost python work
+        positions, airborne = self.fleet_positions()
+        x0, y0, x1, y1 = self.view(20)
+        visible_planes = np.flatnonzero((positions[:, 0] >= x0) & (positions[:, 0] <= x1)
+                                        & (positions[:, 1] >= y0) & (positions[:, 1] <= y1)).tolist()
 
         for object in self.const_objects:
-            if object['type'] == 'circle':
-                pygame.draw.circle(self.screen, object['color'], object['coords'], object['size'])
-            if object['type'] == 'font':
-                name_surface = self.font.render(object['name'], True, object['color'])
-                name_rect = name_surface.get_rect()
-                name_rect.center = object['coords'][0], object['coords'][1] + 30
-                self.screen.blit(name_surface, name_rect)
-            if object['type'] == 'rectangle':
-                pygame.draw.rect(self.screen, object['color'], pygame.Rect(object['coords'][0], object['coords'][1], object['coords'][2], object['coords'][3]))
             if object['type'] == 'airport_legend':
-                temp = 20
-                for a in self.airports:
-                    text_surface = self.font.render(a.name+":", True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = 600, temp
-                    self.screen.blit(text_surface, text_rect)
+                x, temp = object['coords']
+                # Four lines per airport, as many airports a page as fit between the two summary lines
+                per_page = max((self.map_rect.height - 110) // 110 + 1, 1)
+                pages = max((len(self.visible_airports) - 1) // per_page + 1, 1)
+                self.airport_page = min(self.airport_page, pages - 1)
+                summary = f"{len(self.visible_airports)}/{len(self.airports)} airports"
+                if pages > 1:
+                    summary += f", page {self.airport_page + 1}/{pages}"
+                place('airport_summary', self.text('airport_summary', summary, object['color']), (x, temp))
+                temp += 25
+                first = self.airport_page * per_page
+                for i in self.visible_airports[first:first + per_page]:
+                    a = self.airports[i]
+                    planes, cargo_space, passengers = self.airport_stats(a)
+                    place((a.name, 'name'), self.text((a.name, 'name'), a.name+":", object['color']), (x, temp))
                     temp+=20
-                    text_surface = self.font.render(str(len(a.current_planes))+" planes", True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = 600, temp
-                    self.screen.blit(text_surface, text_rect)
+                    place((a.name, 'planes'), self.text((a.name, 'planes'), str(planes)+" planes", object['color']), (x, temp))
                     temp+=20
-                    text_surface = self.font.render(("cargo: "+str(a.cargo_space)+"/"+str(a.cargo_capacity)), True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = 600, temp
-                    self.screen.blit(text_surface, text_rect)
+                    place((a.name, 'cargo'), self.text((a.name, 'cargo'), "cargo: "+str(cargo_space)+"/"+str(a.cargo_capacity), object['color']), (x, temp))
                     temp+=20
-                    text_surface = self.font.render(("passengers: "+str(len(a.passengers))+"/"+str(a.passenger_capacity)), True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = 600, temp
-                    self.screen.blit(text_surface, text_rect)
+                    place((a.name, 'passengers'), self.text((a.name, 'passengers'), "passengers: "+str(passengers)+"/"+str(a.passenger_capacity), object['color']), (x, temp))
                     temp+=50
             if object['type'] == 'plane_legend':
                 temp = 0
-                for p in self.planes:
+                x, y = object['coords']
+                per_page = max(self.size[0] // 200, 1)
+                pages = max((len(visible_planes) - 1) // per_page + 1, 1)
+                self.plane_page = min(self.plane_page, pages - 1)
+                summary = f"{len(visible_planes)}/{len(self.planes)} planes"
+                if pages > 1:
+                    summary += f", page {self.plane_page + 1}/{pages}"
+                place('plane_summary', self.text('plane_summary', summary, self.color['WHITE']),
+                      (self.map_rect.width + self.legend_width // 2, self.map_rect.height - 15))
+                first = self.plane_page * per_page
+                for slot in visible_planes[first:first + per_page]:
+                    p = self.slot_planes[slot]
+                    plane_route, current, cargo_space, passengers = self.plane_stats(p)
                     route = "< "
-                    for i in p.route:
-                        if p.route[p.destination-1] == i:
+                    for i in plane_route:
+                        if current == i:
                             route += "'"+str(i.name)+"' "
                         else:
                             route += i.name + " "
                     route += ">"
 
-                    text_surface = self.font.render(p.name+":", True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = object['coords'][0]+temp, object['coords'][1]
-                    self.screen.blit(text_surface, text_rect)
-                    text_surface = self.font.render(route, True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = object['coords'][0]+temp, object['coords'][1]+20
-                    self.screen.blit(text_surface, text_rect)
-                    text_surface = self.font.render(("cargo: "+str(p.cargo_space)+"/"+str(p.cargo_capacity)), True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = object['coords'][0]+temp, object['coords'][1]+40
-                    self.screen.blit(text_surface, text_rect)
-                    text_surface = self.font.render(("passengers: "+str(len(p.passengers))+"/"+str(p.passenger_capacity)), True, object['color'])
-                    text_rect = text_surface.get_rect()
-                    text_rect.center = object['coords'][0]+temp, object['coords'][1]+60
-                    self.screen.blit(text_surface, text_rect)
+                    place((p.name, 'name'), self.text((p.name, 'name'), p.name+":", object['color']), (x+temp, y))
+                    place((p.name, 'route'), self.text((p.name, 'route'), route, object['color']), (x+temp, y+20))
+                    place((p.name, 'cargo'), self.text((p.name, 'cargo'), "cargo: "+str(cargo_space)+"/"+str(p.cargo_capacity), object['color']), (x+temp, y+40))
+                    place((p.name, 'passengers'), self.text((p.name, 'passengers'), "passengers: "+str(passengers)+"/"+str(p.passenger_capacity), object['color']), (x+temp, y+60))
                     temp+=200
 
-        for object in self.dynamic_objects:
-            if object['type'] == 'circle':
-                pygame.draw.circle(self.screen, object['color'], object['coords'], object['size'])
-            if object['type'] == 'font':
-                name_surface = self.font.render(object['name'], True, object['color'])
-                name_rect = name_surface.get_rect()
-                name_rect.center = object['coords'][0], object['coords'][1] + 30
-                self.screen.blit(name_surface, name_rect)
-
-        pygame.display.update()
+        flying = [slot for slot in visible_planes if airborne[slot]]
+        for slot in flying:
+            p = self.slot_planes[slot]
+            location = self.to_screen(positions[slot])
+            place((p.name, 'plane'), self.plane_surface, location)
+            if len(flying) <= self.label_limit:
+                place((p.name, 'label'), self.text((p.name, 'label'), p.name, self.color['BLACK']), (location[0], location[1] + 30))
+            # Nothing of the map is drawn over the legends
+            for key in ((p.name, 'plane'), (p.name, 'label')):
+                if key in sprites and not self.map_rect.contains(sprites[key][1]):
+                    del sprites[key]
+
+        status = self.status_text()
+        if status is not None:
+            surface = self.text('status', status, self.color['WHITE'])
+            rect = surface.get_rect()
+            rect.topleft = (5, 5)
+            sprites['status'] = (surface, rect)
+
+        return sprites
 
+    def pygame_update(self):
+        if self.camera_moved:
+            self.redraw_background()
+        sprites = self.frame_sprites()
+
+        # Erase whatever moved, changed or disappeared since the last frame
+        dirty = []
+        for key, (surface, rect) in self.sprites.items():
+            new = sprites.get(key)
+            if new is None or new[0] is not surface or new[1] != rect:
+                self.screen.blit(self.background, rect, rect)
+                dirty.append(rect)
+
+        # Draw what changed, plus anything unchanged that an erase has cut into
+        for key, (surface, rect) in sprites.items():
+            old = self.sprites.get(key)
+            if old is None or old[0] is not surface or old[1] != rect:
+                self.screen.blit(surface, rect)
+                dirty.append(rect)
+            elif rect.collidelist(dirty) != -1:
+                self.screen.blit(surface, rect)
+
+        self.sprites = sprites
+        if dirty:
+            pygame.display.update(dirty)
+
+    def handle_view_event(self, event):
+        # Camera and legend controls, returns True when the event was one of them
+        # Mouse wheel or +/- zoom, dragging the map or w/a/s/d pan, c shows every airport,
+        # page up/down turn the airport legend and , . the plane legend
+        if event.type == pygame.MOUSEWHEEL:
+            point = pygame.mouse.get_pos()
+            self.zoom_at(1.25 ** event.y, point if self.map_rect.collidepoint(point) else self.map_rect.center)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.map_rect.collidepoint(event.pos):
+            self.dragging = event.pos
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.dragging is not None:
+            self.dragging = None
+        elif event.type == pygame.MOUSEMOTION and self.dragging is not None:
+            self.offset = [self.offset[0] - (event.pos[0] - self.dragging[0]) / self.zoom,
+                           self.offset[1] - (event.pos[1] - self.dragging[1]) / self.zoom]
+            self.dragging = event.pos
+            self.camera_moved = True
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.zoom_at(1.25, self.map_rect.center)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.zoom_at(0.8, self.map_rect.center)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d):
+            # A quarter of the view per key press
+            dx = {pygame.K_a: -1, pygame.K_d: 1}.get(event.key, 0) * self.map_rect.width / 4 / self.zoom
+            dy = {pygame.K_w: -1, pygame.K_s: 1}.get(event.key, 0) * self.map_rect.height / 4 / self.zoom
+            self.offset = [self.offset[0] + dx, self.offset[1] + dy]
+            self.camera_moved = True
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+            self.fit_camera()
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+            self.airport_page = max(self.airport_page + (1 if event.key == pygame.K_PAGEDOWN else -1), 0)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_COMMA, pygame.K_PERIOD):
+            self.plane_page = max(self.plane_page + (1 if event.key == pygame.K_PERIOD else -1), 0)
+        else:
+            return False
+        return True
+
+    def handle_events(self):
+        # space pauses, up and down double or halve the speed, f toggles fast forward
+        env = self.env
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+            if self.handle_view_event(event):
+                continue
+            if event.type != pygame.KEYDOWN or not isinstance(env, InteractiveEnvironment):
+                continue
+            if event.key == pygame.K_SPACE:
+                self.paused = not self.paused
+            elif event.key == pygame.K_UP:
+                env.set_factor(env.base_factor / 2)
+            elif event.key == pygame.K_DOWN:
+                env.set_factor(env.base_factor * 2)
+            elif event.key == pygame.K_f:
+                env.toggle_fast_forward()
+
+    def clock_lag(self, wall):
+        # Wall clock seconds the real time clock is behind where it should be, 0 for other clocks
+        env = self.env
+        if not isinstance(env, simpy.rt.RealtimeEnvironment) or env.factor == 0:
+            return 0
+        return wall - (env.real_start + (env.now - env.env_start) * env.factor)
+
+    def measure(self, wall):
+        # Achieved simulation speed and frame rate, recomputed about once a second
+        if self.measure_start is None:
+            self.measure_start = (wall, self.env.now, self.frames)
+            return
+        start_wall, start_now, start_frames = self.measure_start
+        if wall - start_wall >= 1:
+            self.sim_speed = (self.env.now - start_now) / (wall - start_wall)
+            self.fps = (self.frames - start_frames) / (wall - start_wall)
+            self.measure_start = (wall, self.env.now, self.frames)
 
-env = simpy.rt.RealtimeEnvironment(factor=0.5)
-sim_window = GUI(env)
-
-
-planes = [
-    Plane(env, sim_window, "Plane1", 20, 80, 20),
-    Plane(env, sim_window, "Plane2", 30, 70, 30),
-    Plane(env, sim_window, "Plane3", 40, 60, 40)
-]
-airports = [
-    Airport(env, sim_window, "JFK", [100, 200], 15, 22, 50, 20, 200),
-    Airport(env, sim_window, "LAX", [200, 400], 15, 22, 50, 20, 200),
-    Airport(env, sim_window, "ORD", [400, 200], 15, 22, 50, 20, 200),
-    Airport(env, sim_window, "DFW", [300, 300], 15, 22, 50, 20, 200),
-]
-
-# Create airport processes
-airport_processes = []
-for airport in airports:
-    airport_processes.append(env.process(airport.run()))
-
-    # give each airport a reference to the other airports
-    for i in range(len(airports)):
-        if airport != airports[i]:
-            airport.all_airports.append(airports[i])
-
-# Create plane processes
-plane_processes = []
-for plane in planes:
-    # Assign the plane to a random airport
-    plane.route = random.sample(airports, 3)
-    for i in plane.route:
-        print(f'plane-destinations: {i.name}')
-    plane.destination = 1
-    plane_processes.append(env.process(plane.run()))
-
-# Start Pygame
-sim_window.pygame_start(airports, planes)
-# Run the simulation
-env.run(until=300)
+    def run(self):
+        # Redraw the window about frame_rate times per wall clock second, the simulation never calls into the gui
+        # When drawing can not keep up (or the clock is fast forwarding) frames are dropped, the simulation
+        # is never slowed down to draw them
+        frame_wall = 1 / self.frame_rate
+        while True:
+            self.handle_events()
+            if self.paused:
+                # Hold the simulation, the window still answers to the keys
+                while self.paused:
+                    self.pygame_update()
+                    time.sleep(frame_wall)
+                    self.handle_events()
+                if isinstance(self.env, InteractiveEnvironment):
+                    self.env.sync()
+                self.measure_start = None
+                self.next_frame = None
+
+            wall = time.monotonic()
+            self.measure(wall)
+            # Skip the frame while the clock runs more than a frame late, or when it is not due yet
+            # (catching up, fast forward), half a frame of jitter is allowed; draw at least one a second
+            since = wall - self.last_frame if self.last_frame is not None else 1
+            due = self.next_frame is None or wall >= self.next_frame - frame_wall / 2
+            if since >= 1 or (due and self.clock_lag(wall) <= frame_wall):
+                self.pygame_update()
+                self.frames += 1
+                self.last_frame = wall
+                self.next_frame = wall + frame_wall if self.next_frame is None else max(self.next_frame + frame_wall, wall)
+            else:
+                self.dropped += 1
+            # One frame worth of simulation time at the chosen speed
+            yield self.env.timeout(frame_wall / getattr(self.env, 'base_factor', 1))
+
+
+# The original four airport network, capacities and service times are in minutes
+DEFAULT_SCENARIO = {
+    'until': 300,
+    # Number of airports in a randomly picked plane route
+    'route_length': 3,
+    'airports': [
+        {'name': "JFK", 'location': [100, 200], 'refuel_time': 15, 'cargo_service_time': 22, 'cargo_capacity': 50,
+         'passenger_service_time': 20, 'passenger_capacity': 200},
+        {'name': "LAX", 'location': [200, 400], 'refuel_time': 15, 'cargo_service_time': 22, 'cargo_capacity': 50,
+         'passenger_service_time': 20, 'passenger_capacity': 200},
+        {'name': "ORD", 'location': [400, 200], 'refuel_time': 15, 'cargo_service_time': 22, 'cargo_capacity': 50,
+         'passenger_service_time': 20, 'passenger_capacity': 200},
+        {'name': "DFW", 'location': [300, 300], 'refuel_time': 15, 'cargo_service_time': 22, 'cargo_capacity': 50,
+         'passenger_service_time': 20, 'passenger_capacity': 200},
+    ],
+    'planes': [
+        {'name': "Plane1", 'speed': 20, 'passenger_capacity': 80, 'cargo_capacity': 20},
+        {'name': "Plane2", 'speed': 30, 'passenger_capacity': 70, 'cargo_capacity': 30},
+        {'name': "Plane3", 'speed': 40, 'passenger_capacity': 60, 'cargo_capacity': 40},
+    ],
+}
+
+
+def create_model(env, log=None, scenario=DEFAULT_SCENARIO, rng=None, metrics=None):
+    # Airports and planes of the scenario, without routes or processes
+    rng = rng or random
+    if log is not None:
+        log.env = env
+    if metrics is not None:
+        metrics.env = env
+    # Passengers and cargo of every airport and plane live in one pool
+    pool = ItemPool()
+    airports = []
+    for spec in scenario['airports']:
+        spec = dict(spec)
+        spec['location'] = list(spec['location'])
+        airports.append(Airport(env, log=log, rng=rng, pool=pool, metrics=metrics, **spec))
+    by_name = {airport.name: airport for airport in airports}
+    planes = []
+    for spec in scenario['planes']:
+        spec = {key: value for key, value in spec.items() if key != 'route'}
+        planes.append(Plane(env, log=log, rng=rng, pool=pool, metrics=metrics, **spec))
+
+    for airport in airports:
+        # give each airport a reference to the other airports
+        for i in range(len(airports)):
+            if airport != airports[i]:
+                airport.all_airports.append(airports[i])
+        # Scenario files name the destinations of per destination demand
+        if airport.destination_rates is not None:
+            airport.destination_rates = {by_name[d] if isinstance(d, str) else d: tuple(rates)
+                                         for d, rates in airport.destination_rates.items()}
+
+    network = AirportNetwork(airports)
+    for plane in planes:
+        plane.network = network
+    return airports, planes
+
+
+def build_simulation(env, log=None, scenario=DEFAULT_SCENARIO, rng=None, fleet=None, metrics=None):
+    # Every random draw of the run comes from rng, so a seeded random.Random makes it reproducible
+    rng = rng or random
+    airports, planes = create_model(env, log, scenario, rng, metrics)
+    by_name = {airport.name: airport for airport in airports}
+    network = planes[0].network if planes else None
+
+    # Create the demand processes once every airport knows the others
+    for airport in airports:
+        airport.start_arrivals()
+
+    # Create plane processes
+    if fleet is None:
+        fleet = FleetState(len(planes) or 1)
+    for plane, spec in zip(planes, scenario['planes']):
+        if 'route' in spec:
+            plane.route = [by_name[name] for name in spec['route']]
+        elif 'max_leg' in scenario:
+            # Random route that only uses legs the planes can fly
+            plane.route = network.sample_route(rng, scenario.get('route_length', 3), scenario['max_leg'])
+        else:
+            # Assign the plane to a random airport
+            plane.route = rng.sample(airports, scenario.get('route_length', 3))
+        plane.fleet = fleet
+        plane.fleet_index = fleet.register(plane, plane.route[0].location)
+        plane.set_destination(1)
+        plane.process = env.process(plane.run())
+
+    return airports, planes
+
+
+def resume_simulation(env, snapshot, log=None, scenario=None, seed=None, fleet=None, metrics=None,
+                      keep_statistics=False):
+    # Same as build_simulation, but the model starts in the state saved in a snapshot (a dict or a file path)
+    # env must start at the snapshot time, scenario replaces the saved parameters and must use the same names
+    if not isinstance(snapshot, dict):
+        snapshot = load_snapshot(snapshot)
+    airports, planes = create_model(env, log, scenario or snapshot['scenario'], snapshot_rng(snapshot, seed), metrics)
+    if fleet is None:
+        fleet = FleetState(len(planes) or 1)
+    restore_snapshot(snapshot, airports, planes, fleet, keep_statistics)
+    return airports, planes
+
+
+def run_simulation(until=None, headless=False, seed=None, frame_rate=10, log=None, scenario=DEFAULT_SCENARIO,
+                   metrics=None, metrics_path=None, metrics_interval=None, profile_path=None,
+                   snapshot_path=None, snapshot_at=None, resume=None, record_path=None, record_interval=1.0,
+                   stream_port=None, stream_rate=10):
+    # Headless runs use a plain environment and go as fast as the cpu allows,
+    # otherwise the simulation is paced in real time and drawn by the gui
+    # resume continues a saved run, scenario then only replaces its parameters when given
+    # record_path saves plane positions and queue sizes every record_interval for replay.py
+    # stream_port publishes the live state to local subscribers (see stream.py) at most stream_rate times a second
+    if metrics is not None and metrics_interval and metrics_path is None:
+        # The periodic export is written next to the final one
+        raise ValueError('metrics_interval needs a metrics_path')
+    start = 0
+    if resume is not None:
+        resume = load_snapshot(resume)
+        start = resume['time']
+        if until is None:
+            until = (scenario or resume['scenario']).get('until', 300)
+    elif scenario is None:
+        scenario = DEFAULT_SCENARIO
+    rng = random.Random(seed) if seed is not None else None
+    if until is None:
+        until = scenario.get('until', 300)
+    if headless:
+        env = simpy.Environment(initial_time=start)
+    else:
+        env = InteractiveEnvironment(initial_time=start, factor=0.5)
+
+    if resume is not None:
+        # A resumed run goes on counting from where the saved one stopped
+        fleet = FleetState(len(resume['planes']) or 1)
+        airports, planes = resume_simulation(env, resume, log, scenario, seed, fleet, metrics, keep_statistics=True)
+    else:
+        fleet = FleetState(len(scenario['planes']) or 1)
+        airports, planes = build_simulation(env, log, scenario, rng, fleet, metrics)
+    if metrics is not None and metrics_interval:
+        # Periodic snapshots go to a csv next to the final export
+        env.process(metrics.periodic_export(metrics_interval, str(metrics_path) + '.periodic.csv'))
+    recorder = None
+    if record_path is not None:
+        recorder = TrajectoryRecorder(record_path, airports, planes, fleet, record_interval)
+        env.process(recorder.run(env))
+    server = None
+    if stream_port is not None:
+        server = StateServer(airports, planes, fleet, port=stream_port, rate=stream_rate).start()
+        env.process(server.run(env))
+
+    if not headless:
+        # Start Pygame
+        sim_window = GUI(env, frame_rate)
+        sim_window.pygame_start(airports, planes, fleet)
+        env.process(sim_window.run())
+
+    # Run the simulation, through the profiler's step loop when profiling
+    # A snapshot splits the run in two, the state is saved in between
+    stops = [until]
+    if snapshot_path is not None:
+        if snapshot_at is None or not env.now < snapshot_at < until:
+            raise ValueError(f'The snapshot time must be between {env.now} and {until}')
+        stops.insert(0, snapshot_at)
+    profiler = Profiler(env) if profile_path is not None else None
+    for stop in stops:
+        if profiler is not None:
+            profiler.run(stop)
+        else:
+            env.run(until=stop)
+        if stop != until:
+            save_snapshot(snapshot_path, env, airports, planes, until)
+    if profiler is not None:
+        print(profiler.report())
+        profiler.dump_folded(profile_path)
+    if log is not None:
+        log.close()
+    if recorder is not None:
+        recorder.close()
+    if server is not None:
+        server.close(env.now)
+    if metrics is not None and metrics_path is not None:
+        metrics.export(metrics_path)
+    return airports, planes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Airport simulation')
+    parser.add_argument('--scenario', help='scenario file (.json or .toml), the built-in network by default')
+    parser.add_argument('--until', type=float, default=None, help='simulation length, the scenario value by default')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--headless', action='store_true', help='run without the gui as fast as possible')
+    parser.add_argument('--frame-rate', type=float, default=10)
+    parser.add_argument('--trace', action='store_true', help='print every event as it happens')
+    parser.add_argument('--log', help='write the event log to this file')
+    parser.add_argument('--metrics', help='write KPIs to this file at the end of the run (.json or .csv)')
+    parser.add_argument('--metrics-interval', type=float, default=None,
+                        help='also snapshot the KPIs every this many time units')
+    parser.add_argument('--profile', help='profile the engine and write a folded flame graph summary to this file')
+    parser.add_argument('--snapshot', help='save the simulation state to this file at --snapshot-at')
+    parser.add_argument('--snapshot-at', type=float, default=None, help='simulation time of the snapshot')
+    parser.add_argument('--resume', help='continue the run saved in this snapshot file')
+    parser.add_argument('--record', help='record the run to this file for replay.py')
+    parser.add_argument('--record-interval', type=float, default=1.0, help='simulation time between two samples')
+    parser.add_argument('--stream', type=int, default=None, metavar='PORT',
+                        help='publish the live state on this local port, follow it with stream.py')
+    parser.add_argument('--stream-rate', type=float, default=10, help='most frames streamed per second')
+    args = parser.parse_args(argv)
+    if args.snapshot and args.snapshot_at is None:
+        parser.error('--snapshot needs --snapshot-at')
+    if args.metrics_interval and not args.metrics:
+        parser.error('--metrics-interval needs --metrics')
+
+    if args.scenario:
+        scenario = load_scenario(args.scenario)
+    else:
+        # A resumed run keeps the parameters saved in the snapshot
+        scenario = None if args.resume else DEFAULT_SCENARIO
+    log = None
+    if args.trace or args.log:
+        log = EventLog(path=args.log, echo=args.trace)
+    metrics = Metrics() if args.metrics else None
+    run_simulation(args.until, args.headless, args.seed, args.frame_rate, log, scenario,
+                   metrics, args.metrics, args.metrics_interval, args.profile,
+                   args.snapshot, args.snapshot_at, args.resume, args.record, args.record_interval,
+                   args.stream, args.stream_rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+
+import simpy
+
+from Airport_Simulation_Final import build_simulation
+from replication import kpis
+from scenario import generate_scenario
+
+# Scaling benchmarks for the simulation engine.
+# Runs the model headless over a grid of network sizes, demand levels and horizons, every
+# configuration in a fresh process so peak RSS belongs to that configuration alone.
+#
+#   python benchmark.py run results.json
+#   python benchmark.py run quick.json --airports 4 50 --planes 3 100 --horizons 300
+#   python benchmark.py compare before.json after.json
+
+DEFAULT_AIRPORTS = [4, 50, 500]
+DEFAULT_PLANES = [3, 100, 5000]
+DEFAULT_DEMAND = [0.1, 1.0]
+DEFAULT_HORIZONS = [300, 1440]
+
+# Metrics checked by compare, and whether a higher value is better
+COMPARED = {'events_per_second': True, 'wall_time': False, 'peak_rss_mb': False}
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_config(config):
+    airports, planes, demand, horizon, seed = config
+    # The map grows with the network so airport density stays that of the original 500x500 four airport map
+    side = 250 * airports ** 0.5
+    scenario = generate_scenario(airports, planes, width=side, height=side, route_length=(2, min(5, airports)),
+                                 passenger_rate=demand, cargo_rate=demand, until=horizon, seed=seed)
+    env = simpy.Environment()
+    start = time.perf_counter()
+    built_airports, built_planes = build_simulation(env, scenario=scenario, rng=random.Random(seed))
+    setup_time = time.perf_counter() - start
+
+    # Same loop as env.run, counting the events on the way
+    events = 0
+    start = time.perf_counter()
+    while env.peek() < horizon:
+        env.step()
+        events += 1
+    wall_time = time.perf_counter() - start
+
+    return {
+        'airports': airports, 'planes': planes, 'demand': demand, 'horizon': horizon, 'seed': seed,
+        'events': events,
+        'setup_time': setup_time,
+        'wall_time': wall_time,
+        'events_per_second': events / wall_time if wall_time else 0.0,
+        'sim_time_per_second': horizon / wall_time if wall_time else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'kpis': kpis(built_airports, built_planes, horizon),
+    }
+
+
+def config_key(result):
+    return (result['airports'], result['planes'], result['demand'], result['horizon'])
+
+
+def run(path, airports, planes, demand, horizons, seed):
+    configs = [(a, p, d, h, seed) for a, p, d, h in itertools.product(airports, planes, demand, horizons)]
+    results = []
+    # One configuration per worker process, one at a time so they do not compete for the cpu
+    with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_config, configs):
+            print(f"{result['airports']:>5} airports {result['planes']:>5} planes demand {result['demand']:<5} "
+                  f"horizon {result['horizon']:<6} {result['events_per_second']:>10.0f} events/s "
+                  f"{result['wall_time']:>8.2f}s {result['peak_rss_mb']:>8.1f} MB")
+            results.append(result)
+    with open(path, 'w') as f:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                   'processor': platform.processor(), 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'results': results}, f, indent=1)
+
+
+def compare(before_path, after_path, threshold):
+    # Flag every configuration where a metric got worse by more than threshold (0.1 = 10%)
+    with open(before_path) as f:
+        before = {config_key(r): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {config_key(r): r for r in json.load(f)['results']}
+
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        changes = []
+        for name, higher_is_better in COMPARED.items():
+            old, new = before[key][name], after[key][name]
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = ' REGRESSION' if worse > threshold else ''
+            regressions += bool(flag)
+            changes.append(f'{name} {change:+.1%}{flag}')
+        print(f'{key[0]:>5} airports {key[1]:>5} planes demand {key[2]:<5} horizon {key[3]:<6} ' + ', '.join(changes))
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f'{key} is only in {"the first" if key in before else "the second"} file')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Airport simulation scaling benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmark grid and save the results as json')
+    run_parser.add_argument('output')
+    run_parser.add_argument('--airports', type=int, nargs='+', default=DEFAULT_AIRPORTS)
+    run_parser.add_argument('--planes', type=int, nargs='+', default=DEFAULT_PLANES)
+    run_parser.add_argument('--demand', type=float, nargs='+', default=DEFAULT_DEMAND,
+                            help='passenger and cargo arrivals per airport per time unit')
+    run_parser.add_argument('--horizons', type=float, nargs='+', default=DEFAULT_HORIZONS)
+    run_parser.add_argument('--seed', type=int, default=1)
+    compare_parser = commands.add_parser('compare', help='flag regressions between two result files')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        run(args.output, args.airports, args.planes, args.demand, args.horizons, args.seed)
+    elif compare(args.before, args.after, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
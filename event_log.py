@@ -0,0 +1,211 @@
+import json
+import struct
+import threading
+from array import array
+from collections import namedtuple
+
+# Structured event log for the airport simulation.
+# Records are kept in an in-memory ring buffer, and when a path is given a background
+# thread writes them in batches to a compact columnar binary file (see read_event_log).
+
+# Record categories
+SPAWN = 0
+BOARD = 1
+DEPLANE = 2
+TAKEOFF = 3
+LAND = 4
+REFUEL = 5
+RUNWAY_WAIT = 6
+REJECT = 7
+GATE_WAIT = 8
+CATEGORIES = ['spawn', 'board', 'deplane', 'takeoff', 'land', 'refuel', 'runway_wait', 'reject', 'gate_wait']
+
+# Record levels, a category set to OFF keeps nothing
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+# Item groups
+NO_GROUP = 0
+PASSENGER = 1
+CARGO = 2
+GROUPS = ['', 'passenger', 'cargo']
+
+EventRecord = namedtuple('EventRecord', ['time', 'category', 'level', 'group', 'subject', 'other', 'value'])
+
+# File layout: MAGIC, then blocks of "<I" record count followed by one column per field,
+# and a final block with count END_OF_RECORDS followed by the "<I" length and json of the name table
+MAGIC = b'AEVL\x01'
+END_OF_RECORDS = 0xFFFFFFFF
+COLUMNS = [('d', 'time'), ('B', 'category'), ('B', 'level'), ('B', 'group'), ('i', 'subject'), ('i', 'other'), ('d', 'value')]
+
+
+# Define the EventLog class
+class EventLog:
+    def __init__(self, env=None, path=None, levels=None, default_level=INFO, capacity=65536,
+                 batch_size=8192, flush_interval=1.0, echo=False):
+        # Simulation environment the records take their time from
+        self.env = env
+        # File the background writer appends to, None keeps records in memory only
+        self.path = path
+        # Minimum level kept for every category, indexed by category
+        self.thresholds = [default_level] * len(CATEGORIES)
+        for name, level in (levels or {}).items():
+            self.thresholds[CATEGORIES.index(name)] = level
+        # Ring buffer of records, self.written counts every record ever stored
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.written = 0
+        # Number of records handed to the writer, and records overwritten before it got to them
+        self.flushed = 0
+        self.dropped = 0
+        # Number of pending records that wakes the writer early
+        self.batch_size = batch_size
+        # Seconds between two flushes when the log is quiet
+        self.flush_interval = flush_interval
+        # Print a readable line for every kept record
+        self.echo = echo
+        # Entity names are stored once, records reference them by index
+        self.names = []
+        self.ids = {}
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.file = None
+        self.writer = None
+        if path is not None:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+            self.writer = threading.Thread(target=self.write_loop, name='event-log-writer', daemon=True)
+            self.writer.start()
+
+    def enabled(self, category, level=INFO):
+        return level >= self.thresholds[category]
+
+    def name_id(self, entity):
+        if entity is None:
+            return -1
+        name = entity.name
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def record(self, category, subject, other=None, value=0, group=NO_GROUP, level=INFO):
+        if level < self.thresholds[category]:
+            return
+        r = (self.env.now, category, level, group, self.name_id(subject), self.name_id(other), value)
+        with self.lock:
+            self.buffer[self.written % self.capacity] = r
+            self.written += 1
+            pending = self.written - self.flushed
+        if self.echo:
+            print(self.format(r))
+        if self.writer is not None and pending >= self.batch_size:
+            self.wake.set()
+
+    def format(self, r):
+        time, category, level, group, subject, other, value = r
+        line = f'{time:.2f}: {CATEGORIES[category]} {self.names[subject]}'
+        if other >= 0:
+            line += f' {self.names[other]}'
+        if group:
+            line += f' {GROUPS[group]}'
+        return line + f' {value:g}'
+
+    def take_pending(self):
+        # Copy the records the writer has not seen yet out of the ring buffer
+        with self.lock:
+            start = max(self.flushed, self.written - self.capacity)
+            self.dropped += start - self.flushed
+            batch = [self.buffer[i % self.capacity] for i in range(start, self.written)]
+            self.flushed = self.written
+        return batch
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        self.file.write(struct.pack('<I', len(batch)))
+        for i, (code, field) in enumerate(COLUMNS):
+            self.file.write(array(code, [r[i] for r in batch]).tobytes())
+
+    def write_loop(self):
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.write_batch(self.take_pending())
+
+    def records(self):
+        # Records still held in the ring buffer, oldest first
+        with self.lock:
+            start = max(0, self.written - self.capacity)
+            rows = [self.buffer[i % self.capacity] for i in range(start, self.written)]
+        return [self.decode(r) for r in rows]
+
+    def decode(self, r):
+        time, category, level, group, subject, other, value = r
+        return EventRecord(time, CATEGORIES[category], level, GROUPS[group], self.names[subject],
+                           self.names[other] if other >= 0 else None, value)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer is not None:
+            self.wake.set()
+            self.writer.join()
+            self.write_batch(self.take_pending())
+            table = json.dumps({'names': self.names, 'dropped': self.dropped}).encode()
+            self.file.write(struct.pack('<II', END_OF_RECORDS, len(table)))
+            self.file.write(table)
+            self.file.close()
+
+
+# Define the NullEventLog class, used when logging is disabled so the hot path is a bare call
+class NullEventLog:
+    env = None
+
+    def enabled(self, category, level=INFO):
+        return False
+
+    def record(self, category, subject, other=None, value=0, group=NO_GROUP, level=INFO):
+        pass
+
+    def records(self):
+        return []
+
+    def close(self):
+        pass
+
+
+DISABLED = NullEventLog()
+
+
+def read_event_log(path):
+    # Decode a file written by EventLog back into a list of EventRecord
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not an event log file')
+    offset = len(MAGIC)
+    columns = [[] for _ in COLUMNS]
+    names = []
+    while offset < len(data):
+        n, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        if n == END_OF_RECORDS:
+            length, = struct.unpack_from('<I', data, offset)
+            names = json.loads(data[offset+4:offset+4+length])['names']
+            break
+        for i, (code, field) in enumerate(COLUMNS):
+            column = array(code)
+            size = column.itemsize * n
+            column.frombytes(data[offset:offset+size])
+            columns[i].extend(column)
+            offset += size
+    return [EventRecord(time, CATEGORIES[category], level, GROUPS[group], names[subject],
+                        names[other] if other >= 0 else None, value)
+            for time, category, level, group, subject, other, value in zip(*columns)]
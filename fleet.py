@@ -0,0 +1,78 @@
+import numpy as np
+
+# Fleet state store.
+# Every plane owns one slot in a set of contiguous arrays holding its current leg, so the
+# position, heading and distance remaining of the whole fleet come from one vectorized step
+# instead of a walk over the Plane objects.
+
+
+# Define the FleetState class
+class FleetState:
+    def __init__(self, capacity=64):
+        # Number of slots handed out
+        self.size = 0
+        # Plane object of every slot, for readers that need names
+        self.planes = []
+        # Leg of every slot: where it started, where it ends, when it left and how long it takes
+        self.origin = np.zeros((capacity, 2))
+        self.target = np.zeros((capacity, 2))
+        self.departure = np.zeros(capacity)
+        self.duration = np.zeros(capacity)
+        # True while the plane in the slot is in the air
+        self.airborne = np.zeros(capacity, dtype=bool)
+        # Result of the last step, reused while the simulation time has not moved
+        self.step_time = None
+        self.state = None
+
+    def grow(self):
+        capacity = 2 * len(self.departure)
+        for name in ('origin', 'target'):
+            array = np.zeros((capacity, 2))
+            array[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, array)
+        for name, dtype in (('departure', float), ('duration', float), ('airborne', bool)):
+            array = np.zeros(capacity, dtype=dtype)
+            array[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, array)
+
+    def register(self, plane, location):
+        # Give the plane a slot, parked at location
+        if self.size == len(self.departure):
+            self.grow()
+        i = self.size
+        self.size += 1
+        self.planes.append(plane)
+        self.origin[i] = location
+        self.target[i] = location
+        self.step_time = None
+        return i
+
+    def depart(self, i, origin, target, now, duration):
+        self.origin[i] = origin
+        self.target[i] = target
+        self.departure[i] = now
+        self.duration[i] = duration
+        self.airborne[i] = True
+        self.step_time = None
+
+    def land(self, i):
+        self.origin[i] = self.target[i]
+        self.airborne[i] = False
+        self.step_time = None
+
+    def step(self, now):
+        # Positions, headings and distance remaining of every slot at time now
+        # Returns (positions (n, 2), headings in radians (n,), remaining distance (n,), airborne (n,))
+        if self.step_time == now and self.state is not None:
+            return self.state
+        n = self.size
+        delta = self.target[:n] - self.origin[:n]
+        duration = self.duration[:n]
+        progress = np.divide(now - self.departure[:n], duration, out=np.ones(n), where=duration > 0)
+        progress = np.where(self.airborne[:n], np.clip(progress, 0, 1), 1)
+        positions = self.origin[:n] + delta * progress[:, None]
+        headings = np.arctan2(delta[:, 1], delta[:, 0])
+        remaining = np.hypot(delta[:, 0], delta[:, 1]) * (1 - progress)
+        self.step_time = now
+        self.state = (positions, headings, remaining, self.airborne[:n].copy())
+        return self.state
@@ -0,0 +1,252 @@
+import csv
+import json
+import math
+
+# KPI instrumentation for the airport simulation.
+# Counters, histograms backed by a streaming quantile sketch with bounded memory, and
+# time weighted gauges. A Metrics registry hands them out by name and exports them as
+# json or csv, at the end of the run or periodically from a simulation process.
+
+
+# Define the Counter class
+class Counter:
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def summary(self, now):
+        return {'value': self.value}
+
+
+# Define the QuantileSketch class, logarithmic buckets with a bounded relative error
+# (the DDSketch idea): a value x lands in bucket ceil(log(x) / log(gamma))
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        # {bucket key: count}
+        self.buckets = {}
+        # Lowest bucket key, once buckets have been folded lower values all land in it
+        self.min_key = math.inf
+        self.folded = False
+        # Values that are zero or negative, kept apart from the log buckets
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        if key < self.min_key:
+            if self.folded:
+                key = self.min_key
+            else:
+                self.min_key = key
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            # Move the lowest bucket up a key at a time until it merges into the next one,
+            # only the smallest values lose accuracy
+            self.folded = True
+            while len(self.buckets) > self.max_buckets:
+                count = self.buckets.pop(self.min_key)
+                self.min_key += 1
+                self.buckets[self.min_key] = self.buckets.get(self.min_key, 0) + count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+# Define the Histogram class
+class Histogram:
+    kind = 'histogram'
+    quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(self, relative_accuracy=0.01):
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, x):
+        self.count += 1
+        self.total += x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.sketch.add(x)
+
+    def observe_many(self, values):
+        for x in values:
+            self.observe(x)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, now):
+        result = {'count': self.count, 'mean': self.mean(),
+                  'min': self.min if self.count else None, 'max': self.max if self.count else None}
+        for q in self.quantiles:
+            value = self.sketch.quantile(q)
+            # Bucket midpoints can lie past the observed extremes
+            if value is not None:
+                value = min(max(value, self.min), self.max)
+            result[f'p{round(q * 100)}'] = value
+        return result
+
+
+# Define the TimeWeightedGauge class, a level whose average is weighted by how long it was held
+class TimeWeightedGauge:
+    kind = 'gauge'
+
+    def __init__(self, env):
+        self.env = env
+        self.value = 0
+        self.max = 0
+        # Integral of the value over time since start
+        self.area = 0.0
+        self.start = env.now
+        self.last_change = env.now
+
+    def set(self, value):
+        now = self.env.now
+        self.area += self.value * (now - self.last_change)
+        self.last_change = now
+        self.value = value
+        if value > self.max:
+            self.max = value
+
+    def add(self, n):
+        self.set(self.value + n)
+
+    def mean(self, now):
+        elapsed = now - self.start
+        if elapsed <= 0:
+            return self.value
+        return (self.area + self.value * (now - self.last_change)) / elapsed
+
+    def summary(self, now):
+        return {'value': self.value, 'mean': self.mean(now), 'max': self.max}
+
+
+# Define the Metrics class, the registry every instrument is created from
+class Metrics:
+    enabled = True
+    columns = ['time', 'name', 'type', 'value', 'count', 'mean', 'min', 'max', 'p50', 'p90', 'p99']
+
+    def __init__(self, env=None, relative_accuracy=0.01):
+        # Simulation environment the gauges and exports take their time from
+        self.env = env
+        self.relative_accuracy = relative_accuracy
+        # {name: instrument}, in creation order
+        self.instruments = {}
+
+    def counter(self, name):
+        if name not in self.instruments:
+            self.instruments[name] = Counter()
+        return self.instruments[name]
+
+    def histogram(self, name):
+        if name not in self.instruments:
+            self.instruments[name] = Histogram(self.relative_accuracy)
+        return self.instruments[name]
+
+    def gauge(self, name):
+        if name not in self.instruments:
+            self.instruments[name] = TimeWeightedGauge(self.env)
+        return self.instruments[name]
+
+    def snapshot(self):
+        now = self.env.now
+        return {name: dict(instrument.summary(now), type=instrument.kind)
+                for name, instrument in self.instruments.items()}
+
+    def rows(self):
+        now = self.env.now
+        for name, summary in self.snapshot().items():
+            row = {'time': now, 'name': name}
+            row.update(summary)
+            yield row
+
+    def export_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'time': self.env.now, 'metrics': self.snapshot()}, f, indent=1)
+
+    def export_csv(self, path, append=False):
+        with open(path, 'a' if append else 'w', newline='') as f:
+            writer = csv.DictWriter(f, self.columns, extrasaction='ignore')
+            if not append or f.tell() == 0:
+                writer.writeheader()
+            writer.writerows(self.rows())
+
+    def export(self, path):
+        if str(path).endswith('.json'):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def periodic_export(self, interval, path):
+        # Simulation process appending a csv snapshot of every instrument each interval
+        open(path, 'w').close()
+        while True:
+            yield self.env.timeout(interval)
+            self.export_csv(path, append=True)
+
+
+# Define the NullInstrument class, returned for every name when metrics are disabled
+class NullInstrument:
+    value = 0
+
+    def inc(self, n=1):
+        pass
+
+    def observe(self, x):
+        pass
+
+    def observe_many(self, values):
+        pass
+
+    def set(self, value):
+        pass
+
+    def add(self, n):
+        pass
+
+
+NULL_INSTRUMENT = NullInstrument()
+
+
+# Define the NullMetrics class, used when metrics are disabled so instruments cost a bare call
+class NullMetrics:
+    enabled = False
+    env = None
+
+    def counter(self, name):
+        return NULL_INSTRUMENT
+
+    def histogram(self, name):
+        return NULL_INSTRUMENT
+
+    def gauge(self, name):
+        return NULL_INSTRUMENT
+
+
+DISABLED = NullMetrics()
@@ -0,0 +1,101 @@
+import numpy as np
+
+# Airport network index.
+# The pairwise distance matrix is computed once when the network is built, so flight
+# scheduling and routing look distances and travel times up instead of doing trigonometry.
+
+
+def distance_matrix(locations):
+    # distance[i, j] is the straight line distance from location i to location j
+    locations = np.array(locations, dtype=float).reshape(-1, 2)
+    dx = locations[None, :, 0] - locations[:, None, 0]
+    dy = locations[None, :, 1] - locations[:, None, 1]
+    return np.sqrt(dx**2 + dy**2)
+
+
+def sample_route(rng, distance, length, max_leg=None):
+    # Indexes of a random walk without repeats, every leg at most max_leg long when possible
+    route = [rng.randrange(len(distance))]
+    while len(route) < length:
+        row = distance[route[-1]].copy()
+        row[route] = np.inf
+        candidates = np.flatnonzero(row <= max_leg) if max_leg is not None else np.flatnonzero(row < np.inf)
+        if len(candidates) == 0:
+            # Nothing in range, take the nearest airport not visited yet
+            candidates = [int(np.argmin(row))]
+        route.append(int(candidates[rng.randrange(len(candidates))]))
+    return route
+
+
+# Define the AirportNetwork class
+class AirportNetwork:
+    def __init__(self, airports):
+        self.airports = list(airports)
+        # Every airport knows its row in the matrices
+        for i, airport in enumerate(self.airports):
+            airport.index = i
+        # distance[i, j] is the straight line distance from airport i to airport j
+        self.distance = distance_matrix([airport.location for airport in self.airports])
+        # Travel time matrices, one per plane speed, built the first time a speed is asked for
+        self.travel_times = {}
+        # Cached route costs, {(airport indexes, speed): cost}
+        self.route_costs = {}
+        # Cached shortest path trees, {(origin index, max_leg): predecessor array}
+        self.path_trees = {}
+
+    def leg_distance(self, origin, target):
+        return float(self.distance[origin.index, target.index])
+
+    def travel_time(self, origin, target, speed):
+        times = self.travel_times.get(speed)
+        if times is None:
+            times = self.travel_times[speed] = self.distance / speed
+        return float(times[origin.index, target.index])
+
+    def route_cost(self, route, speed=None):
+        # Total distance of a route, or total flight time when a speed is given
+        key = (tuple(airport.index for airport in route), speed)
+        cost = self.route_costs.get(key)
+        if cost is None:
+            legs = self.distance[list(key[0][:-1]), list(key[0][1:])]
+            cost = float(legs.sum()) if speed is None else float(legs.sum() / speed)
+            self.route_costs[key] = cost
+        return cost
+
+    def path_tree(self, origin, max_leg):
+        # Dijkstra over the dense matrix, a leg longer than max_leg is not allowed
+        key = (origin, max_leg)
+        tree = self.path_trees.get(key)
+        if tree is not None:
+            return tree
+        n = len(self.airports)
+        edges = self.distance if max_leg is None else np.where(self.distance <= max_leg, self.distance, np.inf)
+        cost = np.full(n, np.inf)
+        previous = np.full(n, -1)
+        done = np.zeros(n, dtype=bool)
+        cost[origin] = 0
+        for _ in range(n):
+            i = int(np.argmin(np.where(done, np.inf, cost)))
+            if done[i] or cost[i] == np.inf:
+                break
+            done[i] = True
+            through = cost[i] + edges[i]
+            better = (through < cost) & ~done
+            cost[better] = through[better]
+            previous[better] = i
+        tree = self.path_trees[key] = (cost, previous)
+        return tree
+
+    def shortest_path(self, origin, target, max_leg=None):
+        # Cheapest list of airports from origin to target, None if target can not be reached
+        cost, previous = self.path_tree(origin.index, max_leg)
+        if cost[target.index] == np.inf:
+            return None
+        path = [target.index]
+        while path[-1] != origin.index:
+            path.append(int(previous[path[-1]]))
+        return [self.airports[i] for i in reversed(path)]
+
+    def sample_route(self, rng, length, max_leg=None):
+        # Random route without repeated airports, every leg at most max_leg long when possible
+        return [self.airports[i] for i in sample_route(rng, self.distance, length, max_leg)]
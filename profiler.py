@@ -0,0 +1,95 @@
+import time
+from collections import defaultdict
+
+from simpy.events import Process
+
+# Opt-in engine profiler.
+# Profiler.run drives the SimPy step loop itself and, for every event, finds the processes it
+# resumes, so event counts and wall clock time can be attributed to each process type
+# (Plane.run, Airport.arrivals, GUI.run, ...) and entity (airport or plane name).
+
+
+# Define the Profiler class
+class Profiler:
+    def __init__(self, env):
+        self.env = env
+        # {(entity type, entity name, process): [events, wall seconds]}
+        self.stats = defaultdict(lambda: [0, 0.0])
+        # Who each process belongs to, looked up once per process
+        self.owners = {}
+        self.events = 0
+        self.wall_time = 0.0
+        self.sim_time = 0.0
+
+    def owner(self, process):
+        key = self.owners.get(process)
+        if key is None:
+            generator = process._generator
+            name = getattr(generator, '__qualname__', type(generator).__name__)
+            frame = getattr(generator, 'gi_frame', None)
+            entity = frame.f_locals.get('self') if frame is not None else None
+            if entity is None:
+                key = ('engine', '-', name)
+            else:
+                key = (type(entity).__name__, str(getattr(entity, 'name', type(entity).__name__)), name)
+            self.owners[process] = key
+        return key
+
+    def attribution(self, event):
+        # Processes the event will resume, engine if it resumes none
+        keys = []
+        for callback in event.callbacks or ():
+            process = getattr(callback, '__self__', None)
+            if isinstance(process, Process):
+                keys.append(self.owner(process))
+        return keys or [('engine', '-', type(event).__name__)]
+
+    def run(self, until):
+        env = self.env
+        queue = env._queue
+        start_sim = env.now
+        start = time.perf_counter()
+        while queue and env.peek() < until:
+            keys = self.attribution(queue[0][3])
+            t = time.perf_counter()
+            env.step()
+            elapsed = time.perf_counter() - t
+            # Several processes woken by one event share its cost
+            for key in keys:
+                stat = self.stats[key]
+                stat[0] += 1
+                stat[1] += elapsed / len(keys)
+            self.events += 1
+        # Move the clock to the end, nothing is left to run before it
+        env.run(until=until)
+        self.wall_time += time.perf_counter() - start
+        self.sim_time += env.now - start_sim
+
+    def report(self):
+        lines = [f'{self.events} events in {self.wall_time:.3f}s wall, '
+                 f'{self.events / self.wall_time if self.wall_time else 0:.0f} events/s, '
+                 f'{self.sim_time / self.wall_time if self.wall_time else 0:.1f} sim time per wall second']
+
+        # Per process type first, then the busiest entities
+        by_process = defaultdict(lambda: [0, 0.0])
+        for (kind, entity, process), (events, wall) in self.stats.items():
+            by_process[process][0] += events
+            by_process[process][1] += wall
+        lines.append(f'{"process":<32}{"events":>10}{"wall s":>10}{"share":>8}')
+        for process, (events, wall) in sorted(by_process.items(), key=lambda item: -item[1][1]):
+            share = wall / self.wall_time * 100 if self.wall_time else 0
+            lines.append(f'{process:<32}{events:>10}{wall:>10.3f}{share:>7.1f}%')
+        lines.append(f'{"entity":<32}{"events":>10}{"wall s":>10}')
+        entities = defaultdict(lambda: [0, 0.0])
+        for (kind, entity, process), (events, wall) in self.stats.items():
+            entities[f'{kind} {entity}'][0] += events
+            entities[f'{kind} {entity}'][1] += wall
+        for entity, (events, wall) in sorted(entities.items(), key=lambda item: -item[1][1])[:20]:
+            lines.append(f'{entity:<32}{events:>10}{wall:>10.3f}')
+        return '\n'.join(lines)
+
+    def dump_folded(self, path):
+        # One "type;entity;process microseconds" line per stack, the input format of flamegraph.pl and speedscope
+        with open(path, 'w') as f:
+            for (kind, entity, process), (events, wall) in sorted(self.stats.items()):
+                f.write(f'{kind};{entity};{process} {max(1, round(wall * 1e6))}\n')
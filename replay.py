@@ -0,0 +1,182 @@
+import argparse
+import time
+
+from Airport_Simulation_Final import GUI, load_pygame
+from trajectory import AIRBORNE, REVERSED, Trajectory
+
+# Replay of a recorded trajectory file (see trajectory.py) with the simulation GUI.
+# Nothing is simulated again, every frame is read from the memory mapped file, so a recording
+# plays at any speed and can be sought and scrubbed back and forth.
+#
+#   python replay.py run.traj --speed 30
+#
+# space pauses, left and right seek a twentieth of the recording, up and down double or halve
+# the speed, home and end jump to either end, clicking or dragging the bar at the bottom scrubs,
+# the map zooms, pans and pages its legends like the simulation GUI (see GUI.handle_view_event)
+
+# pygame is loaded by the viewer, like the GUI it is built on
+pygame = None
+
+
+# Define the ReplayAirport class, the fixed part of a recorded airport
+class ReplayAirport:
+    def __init__(self, index, name, location, cargo_capacity, passenger_capacity):
+        self.index = index
+        self.name = name
+        self.location = location
+        self.cargo_capacity = cargo_capacity
+        self.passenger_capacity = passenger_capacity
+
+
+# Define the ReplayPlane class, the fixed part of a recorded plane
+class ReplayPlane:
+    def __init__(self, index, name, cargo_capacity, passenger_capacity, route):
+        # The GUI looks positions up by fleet slot, in a recording that is the plane's column
+        self.fleet_index = index
+        self.name = name
+        self.cargo_capacity = cargo_capacity
+        self.passenger_capacity = passenger_capacity
+        self.route = route
+
+
+# Define the ReplayGUI class, the simulation GUI drawing recorded frames
+class ReplayGUI(GUI):
+    # Height of the scrub bar along the bottom of the window
+    bar_height = 8
+
+    def __init__(self, trajectory, frame_rate=30, speed=10):
+        global pygame
+        super().__init__(None, frame_rate)
+        pygame = load_pygame()
+        self.trajectory = trajectory
+        # Simulation time units played per wall clock second
+        self.speed = speed
+        self.time = trajectory.start
+        self.paused = False
+        # Record shown and the plane positions of the current frame
+        self.record = None
+        self.positions = None
+        self.bar = None
+        self.marker = None
+
+    def pygame_start(self, Airports=None, Planes=None, fleet=None):
+        header = self.trajectory.header
+        airports = [ReplayAirport(i, a['name'], a['location'], a['cargo_capacity'], a['passenger_capacity'])
+                    for i, a in enumerate(header['airports'])]
+        planes = [ReplayPlane(i, p['name'], p['cargo_capacity'], p['passenger_capacity'],
+                              [airports[j] for j in p['route']]) for i, p in enumerate(header['planes'])]
+        # The first frame is drawn by pygame_start, it needs a record
+        self.seek(self.trajectory.start)
+        super().pygame_start(airports, planes, None)
+        pygame.display.set_caption('Airport Simulation replay')
+        self.marker = pygame.Surface((4, self.bar_height))
+        self.marker.fill(self.color['YELLOW'])
+
+    def redraw_background(self):
+        # The scrub bar track is part of the background, the marker is a sprite
+        width, height = self.screen.get_size()
+        self.bar = pygame.Rect(0, height - self.bar_height, width, self.bar_height)
+        super().redraw_background()
+        pygame.draw.rect(self.background, self.color['GRAY'], self.bar)
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.update()
+
+    def seek(self, t):
+        self.time = min(max(t, self.trajectory.start), self.trajectory.end)
+        self.record, self.positions = self.trajectory.frame(self.time)
+
+    def scrub(self, x):
+        # Jump to the time under x on the scrub bar
+        fraction = min(max(x / self.bar.width, 0), 1)
+        self.seek(self.trajectory.start + fraction * (self.trajectory.end - self.trajectory.start))
+
+    def airport_stats(self, a):
+        record = self.record
+        return (int(record['airport_planes'][a.index]), int(record['airport_cargo'][a.index]),
+                int(record['airport_passengers'][a.index]))
+
+    def plane_stats(self, p):
+        record = self.record
+        i = p.fleet_index
+        route = p.route[::-1] if record['plane_flags'][i] & REVERSED else p.route
+        return (route, self.airports[record['plane_airport'][i]], int(record['plane_cargo'][i]),
+                int(record['plane_passengers'][i]))
+
+    def fleet_positions(self):
+        return self.positions, self.record['plane_flags'] & AIRBORNE
+
+    def status_text(self):
+        state = 'paused' if self.paused else f'x{self.speed:g}'
+        return f'time {self.time:.1f} / {self.trajectory.end:.1f}  {state}'
+
+    def frame_sprites(self):
+        sprites = super().frame_sprites()
+        span = self.trajectory.end - self.trajectory.start
+        fraction = (self.time - self.trajectory.start) / span if span else 0
+        rect = self.marker.get_rect()
+        rect.midbottom = (round(fraction * (self.bar.width - rect.width)) + rect.width // 2, self.bar.bottom)
+        sprites['marker'] = (self.marker, rect)
+        return sprites
+
+    def handle(self, event):
+        # Returns False when the window is closed
+        span = self.trajectory.end - self.trajectory.start
+        if event.type == pygame.QUIT:
+            return False
+        if self.handle_view_event(event):
+            return True
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                self.paused = not self.paused
+            elif event.key == pygame.K_RIGHT:
+                self.seek(self.time + span / 20)
+            elif event.key == pygame.K_LEFT:
+                self.seek(self.time - span / 20)
+            elif event.key == pygame.K_UP:
+                self.speed *= 2
+            elif event.key == pygame.K_DOWN:
+                self.speed /= 2
+            elif event.key == pygame.K_HOME:
+                self.seek(self.trajectory.start)
+            elif event.key == pygame.K_END:
+                self.seek(self.trajectory.end)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.bar.collidepoint(event.pos):
+            self.scrub(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0] and self.bar.collidepoint(event.pos):
+            self.scrub(event.pos[0])
+        return True
+
+    def play(self):
+        # Wall clock loop, the replay time moves speed simulation units per second unless paused
+        clock = pygame.time.Clock()
+        last = time.perf_counter()
+        while True:
+            for event in pygame.event.get():
+                if not self.handle(event):
+                    pygame.quit()
+                    return
+            now = time.perf_counter()
+            if not self.paused:
+                self.seek(self.time + (now - last) * self.speed)
+            last = now
+            self.pygame_update()
+            clock.tick(self.frame_rate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded airport simulation')
+    parser.add_argument('trajectory', help='file written by Airport_Simulation_Final.py --record')
+    parser.add_argument('--speed', type=float, default=10, help='simulation time units per second')
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--start', type=float, default=None, help='simulation time to start from')
+    args = parser.parse_args(argv)
+
+    viewer = ReplayGUI(Trajectory(args.trajectory), args.frame_rate, args.speed)
+    viewer.pygame_start()
+    if args.start is not None:
+        viewer.seek(args.start)
+    viewer.play()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import simpy
+
+from Airport_Simulation_Final import DEFAULT_SCENARIO, build_simulation, resume_simulation
+from snapshot import load_snapshot
+
+# Monte Carlo replications of a scenario.
+# Every replication runs headless in its own worker process with its own seeded
+# random.Random, so a (scenario, seed) pair always gives the same result.
+# Replications can branch from a warmed-up snapshot instead of an empty network, the
+# KPIs then only cover the time after the snapshot.
+
+# Two sided 95% critical values of the t distribution, indexed by degrees of freedom
+T_95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t_critical(df):
+    if df < len(T_95):
+        return T_95[df]
+    return 1.96
+
+
+def kpis(airports, planes, until):
+    # Key performance indicators of one finished run, time is in minutes
+    # until is the length of the measured run, not counting a warm-up restored from a snapshot
+    delivered_passengers = sum(a.delivered_passengers for a in airports)
+    delivered_cargo = sum(a.delivered_cargo for a in airports)
+    boarded = sum(a.boarded_passengers for a in airports)
+    runway_requests = sum(p.runway_requests for p in planes)
+    gate_requests = sum(p.gate_requests for p in planes)
+    departures = sum(p.departures for p in planes)
+    hours = until / 60
+    return {
+        'passenger_deliveries_per_hour': delivered_passengers / hours,
+        'cargo_deliveries_per_hour': delivered_cargo / hours,
+        'mean_passenger_wait': sum(a.passenger_wait for a in airports) / boarded if boarded else 0.0,
+        'mean_runway_queue_time': sum(p.runway_wait for p in planes) / runway_requests if runway_requests else 0.0,
+        'mean_gate_queue_time': sum(p.gate_wait for p in planes) / gate_requests if gate_requests else 0.0,
+        'passenger_load_factor': sum(p.passenger_load for p in planes) / departures if departures else 0.0,
+        'cargo_load_factor': sum(p.cargo_load for p in planes) / departures if departures else 0.0,
+    }
+
+
+def run_replication(scenario, seed, snapshot=None):
+    if snapshot is None:
+        env = simpy.Environment()
+        airports, planes = build_simulation(env, scenario=scenario, rng=random.Random(seed))
+    else:
+        # Warm start, the random stream is a branch of the one saved in the snapshot, picked by the seed
+        if not isinstance(snapshot, dict):
+            snapshot = load_snapshot(snapshot)
+        scenario = scenario or snapshot['scenario']
+        env = simpy.Environment(initial_time=snapshot['time'])
+        airports, planes = resume_simulation(env, snapshot, scenario=scenario, seed=seed)
+    start = env.now
+    until = scenario.get('until', 300)
+    env.run(until=until)
+    result = kpis(airports, planes, until - start)
+    result['seed'] = seed
+    return result
+
+
+def summarize(values):
+    # Mean with a 95% confidence interval
+    n = len(values)
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    half_width = t_critical(n - 1) * stdev / math.sqrt(n) if n > 1 else 0.0
+    return {'mean': mean, 'stdev': stdev, 'ci_low': mean - half_width, 'ci_high': mean + half_width, 'n': n}
+
+
+def replicate(seeds, scenario=None, processes=None, snapshot=None):
+    # Run one replication per seed on a process pool and aggregate the KPIs
+    # With a snapshot every replication starts from it, with the saved parameters unless a scenario is given
+    seeds = list(seeds)
+    if snapshot is not None:
+        # Loaded once here, the workers get the plain data
+        snapshot = load_snapshot(snapshot) if not isinstance(snapshot, dict) else snapshot
+    elif scenario is None:
+        scenario = DEFAULT_SCENARIO
+    processes = processes or os.cpu_count()
+    chunksize = max(1, len(seeds) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(run_replication, [scenario] * len(seeds), seeds, [snapshot] * len(seeds),
+                                chunksize=chunksize))
+
+    summary = {}
+    for name in results[0]:
+        if name != 'seed':
+            summary[name] = summarize([r[name] for r in results])
+    return {'kpis': summary, 'replications': results}
+
+
+if __name__ == '__main__':
+    report = replicate(range(32))
+    for name, s in report['kpis'].items():
+        print(f"{name}: {s['mean']:.3f} [{s['ci_low']:.3f}, {s['ci_high']:.3f}]")
@@ -0,0 +1,133 @@
+import argparse
+import json
+import math
+import random
+
+from network import distance_matrix, sample_route
+
+# Scenario files and the synthetic network generator.
+# A scenario is a plain dict, the same shape as DEFAULT_SCENARIO in Airport_Simulation_Final:
+# {'until': 300, 'route_length': 3, 'airports': [{...Airport arguments}], 'planes': [{...Plane arguments, 'route': [names]}]}
+
+# Airport and plane values used by the generator when nothing else is given
+AIRPORT_DEFAULTS = {'refuel_time': 15, 'cargo_service_time': 22, 'cargo_capacity': 50,
+                    'passenger_service_time': 20, 'passenger_capacity': 200, 'gates': 1, 'runways': 1}
+PLANE_SPEEDS = (20, 40)
+PLANE_PASSENGER_CAPACITY = (60, 80)
+PLANE_CARGO_CAPACITY = (20, 40)
+
+
+def load_scenario(path):
+    # Read a scenario from a .json or .toml file
+    if str(path).endswith('.toml'):
+        # tomllib is in the standard library from Python 3.11, json scenarios work on any version
+        try:
+            import tomllib
+        except ImportError:
+            raise RuntimeError(f'Reading {path} needs Python 3.11 or later, use a .json scenario instead') from None
+        with open(path, 'rb') as f:
+            scenario = tomllib.load(f)
+    else:
+        with open(path) as f:
+            scenario = json.load(f)
+    check_scenario(scenario)
+    return scenario
+
+
+def save_scenario(scenario, path):
+    with open(path, 'w') as f:
+        json.dump(scenario, f, indent=1)
+
+
+def check_scenario(scenario):
+    names = set()
+    for airport in scenario.get('airports', []):
+        if airport['name'] in names:
+            raise ValueError(f"Airport {airport['name']} is defined twice")
+        names.add(airport['name'])
+        for key in ('gates', 'runways'):
+            if airport.get(key, 1) < 1:
+                raise ValueError(f"Airport {airport['name']} needs at least one of {key}")
+    if len(names) < 2:
+        raise ValueError('A scenario needs at least two airports')
+    for plane in scenario.get('planes', []):
+        for name in plane.get('route', []):
+            if name not in names:
+                raise ValueError(f"{plane['name']} has unknown airport {name} in its route")
+        if 'route' in plane and len(plane['route']) < 2:
+            raise ValueError(f"{plane['name']} needs at least two airports in its route")
+    random_routes = any('route' not in plane for plane in scenario.get('planes', []))
+    if random_routes and scenario.get('route_length', 3) > len(names):
+        raise ValueError('route_length is longer than the number of airports')
+
+
+def airport_locations(rng, count, width, height, geography, clusters):
+    # Place airports uniformly over the map, or around a few gaussian clusters
+    if geography == 'uniform':
+        return [[rng.uniform(0, width), rng.uniform(0, height)] for i in range(count)]
+    if geography == 'clustered':
+        centers = [(rng.uniform(0.1, 0.9) * width, rng.uniform(0.1, 0.9) * height) for i in range(clusters)]
+        spread = min(width, height) / (4 * math.sqrt(clusters))
+        locations = []
+        for i in range(count):
+            cx, cy = rng.choice(centers)
+            locations.append([min(max(rng.gauss(cx, spread), 0), width), min(max(rng.gauss(cy, spread), 0), height)])
+        return locations
+    raise ValueError(f'Unknown geography {geography!r}, use "uniform" or "clustered"')
+
+
+def generate_scenario(airports=100, planes=1000, width=5000, height=5000, geography='uniform', clusters=8,
+                      route_length=(2, 5), max_leg=None, passenger_rate=0.1, cargo_rate=0.1, until=1440,
+                      seed=None, gates=1, runways=1):
+    # Build a synthetic network for capacity planning runs
+    rng = random.Random(seed)
+    if airports < 2:
+        raise ValueError('A scenario needs at least two airports')
+    locations = airport_locations(rng, airports, width, height, geography, clusters)
+    distance = distance_matrix(locations)
+    digits = len(str(airports - 1))
+    names = [f'AP{i:0{digits}d}' for i in range(airports)]
+
+    scenario = {'until': until, 'airports': [], 'planes': []}
+    for name, location in zip(names, locations):
+        airport = {'name': name, 'location': [round(location[0], 1), round(location[1], 1)]}
+        airport.update(AIRPORT_DEFAULTS)
+        airport['passenger_rate'] = passenger_rate
+        airport['cargo_rate'] = cargo_rate
+        airport['gates'] = gates
+        airport['runways'] = runways
+        scenario['airports'].append(airport)
+
+    for i in range(planes):
+        length = min(rng.randint(route_length[0], route_length[1]), airports)
+        scenario['planes'].append({
+            'name': f'Plane{i+1}',
+            'speed': rng.randint(*PLANE_SPEEDS),
+            'passenger_capacity': rng.randint(*PLANE_PASSENGER_CAPACITY),
+            'cargo_capacity': rng.randint(*PLANE_CARGO_CAPACITY),
+            'route': [names[j] for j in sample_route(rng, distance, max(length, 2), max_leg)],
+        })
+    return scenario
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic airport network scenario')
+    parser.add_argument('output', help='scenario file to write (json)')
+    parser.add_argument('--airports', type=int, default=100)
+    parser.add_argument('--planes', type=int, default=1000)
+    parser.add_argument('--width', type=float, default=5000)
+    parser.add_argument('--height', type=float, default=5000)
+    parser.add_argument('--geography', choices=['uniform', 'clustered'], default='uniform')
+    parser.add_argument('--clusters', type=int, default=8)
+    parser.add_argument('--min-route', type=int, default=2)
+    parser.add_argument('--max-route', type=int, default=5)
+    parser.add_argument('--max-leg', type=float, default=None)
+    parser.add_argument('--until', type=float, default=1440)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--gates', type=int, default=1, help='gates of every airport')
+    parser.add_argument('--runways', type=int, default=1, help='runways of every airport')
+    args = parser.parse_args()
+    save_scenario(generate_scenario(args.airports, args.planes, args.width, args.height, args.geography,
+                                    args.clusters, (args.min_route, args.max_route), args.max_leg,
+                                    until=args.until, seed=args.seed, gates=args.gates, runways=args.runways),
+                  args.output)
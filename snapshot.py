@@ -0,0 +1,233 @@
+import gzip
+import math
+import pickle
+import random
+from array import array
+
+# Snapshot and resume of the full simulation state.
+# A snapshot is taken between two time steps (after env.run(until=t)), when every process is
+# waiting on a future event, so it can be described by plain data: queues, phases and the times
+# their pending events fire. Restoring rebuilds the model and restarts every process in the
+# phase it was saved in (see resume_simulation). Processes are restarted in the order their pending
+# events were scheduled, so events due at the same time run in the same order as in the uninterrupted
+# run and the resumed run is identical to it. Files are gzip compressed pickles, only load your own.
+
+VERSION = 1
+
+AIRPORT_FIELDS = ['name', 'location', 'refuel_time', 'cargo_service_time', 'cargo_capacity',
+                  'passenger_service_time', 'passenger_capacity', 'passenger_rate', 'cargo_rate',
+                  'runway_policy']
+PLANE_FIELDS = ['name', 'speed', 'passenger_capacity', 'cargo_capacity']
+AIRPORT_COUNTERS = ['delivered_passengers', 'delivered_cargo', 'boarded_passengers', 'passenger_wait']
+PLANE_COUNTERS = ['runway_wait', 'runway_requests', 'gate_wait', 'gate_requests', 'departures',
+                  'passenger_load', 'cargo_load']
+POOL_FIELDS = ['group', 'destination', 'size', 'spawn_time', 'free']
+
+
+def queue_state(queue):
+    # {destination name: handles as bytes}, oldest first
+    return {d.name: handles.tobytes() for d, handles in queue.contents()}
+
+
+def restore_queue(queue, state, by_name):
+    for name, data in state.items():
+        handles = array('i')
+        handles.frombytes(data)
+        queue.extend(by_name[name], handles, queue.pool.total_size(handles))
+
+
+def holders(resource, owners):
+    # Planes holding the resource then queueing for it in order, with the priority they asked with
+    return [(owners[r], getattr(r, 'priority', 0)) for r in resource.users + resource.queue]
+
+
+def take_snapshot(env, airports, planes):
+    # Plain data describing the simulation at env.now
+    pool = airports[0].pool
+    # Scheduling key (time, priority, id) of every pending event, the order they will run in
+    # SimPy keeps its event queue as a heap of (time, priority, id, event)
+    pending = {entry[3]: entry[:3] for entry in env._queue}
+    fleet = planes[0].fleet if planes else None
+    owners = {}
+    for p in planes:
+        for request in (p.runway, p.gate):
+            if request is not None:
+                owners[request] = p.name
+
+    snapshot = {
+        'version': VERSION,
+        'time': env.now,
+        'rng': airports[0].rng.getstate(),
+        'pool': {field: getattr(pool, field).tobytes() for field in POOL_FIELDS},
+        'scenario': {'airports': [], 'planes': []},
+        'airports': [],
+        'planes': [],
+    }
+    for a in airports:
+        spec = {field: getattr(a, field) for field in AIRPORT_FIELDS}
+        spec['gates'] = a.gates.capacity
+        spec['runways'] = a.runway.capacity
+        if a.destination_rates is not None:
+            spec['destination_rates'] = {d.name: list(rates) for d, rates in a.destination_rates.items()}
+        snapshot['scenario']['airports'].append(spec)
+        snapshot['airports'].append({
+            'name': a.name,
+            'passengers': queue_state(a.passengers),
+            'cargo': queue_state(a.cargo),
+            'cargo_space': a.cargo_space,
+            'current_planes': [p.name for p in a.current_planes],
+            'next_arrivals': {(group, d.name if d is not None else None): t for (group, d), t in a.next_arrivals.items()},
+            'arrival_order': {(group, d.name if d is not None else None): pending.get(process.target)
+                              for (group, d), process in a.arrival_processes.items()},
+            'gates': holders(a.gates, owners),
+            'runway': holders(a.runway, owners),
+            'counters': {field: getattr(a, field) for field in AIRPORT_COUNTERS},
+        })
+    for p in planes:
+        snapshot['scenario']['planes'].append({field: getattr(p, field) for field in PLANE_FIELDS})
+        i = p.fleet_index
+        snapshot['planes'].append({
+            'name': p.name,
+            'route': [a.name for a in p.route],
+            'destination': p.destination,
+            'passengers': queue_state(p.passengers),
+            'cargo': queue_state(p.cargo),
+            'cargo_space': p.cargo_space,
+            'phase': p.phase,
+            'phase_end': p.phase_end,
+            'runway_requested': p.runway_requested,
+            'gate_requested': p.gate_requested,
+            'service_start': p.service_start,
+            # Pending event of the plane process and of its unfinished services, None when waiting on a resource
+            'order': pending.get(p.process.target) if p.process is not None else None,
+            'services': {name: pending.get(process.target) for name, process in p.services.items()
+                         if process.is_alive} if p.services is not None else None,
+            'arrival_time': p.arrival_time,
+            'flying': p.flying,
+            'total_delay': p.total_delay,
+            'leg': (fleet.origin[i].tolist(), fleet.target[i].tolist(), float(fleet.departure[i]),
+                    float(fleet.duration[i]), bool(fleet.airborne[i])),
+            'counters': {field: getattr(p, field) for field in PLANE_COUNTERS},
+        })
+    return snapshot
+
+
+def save_snapshot(path, env, airports, planes, until=None):
+    # until is kept as the scenario length, so a resumed run knows where the original one stopped
+    snapshot = take_snapshot(env, airports, planes)
+    if until is not None:
+        snapshot['scenario']['until'] = until
+    with gzip.open(path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path):
+    with gzip.open(path, 'rb') as f:
+        snapshot = pickle.load(f)
+    if snapshot.get('version') != VERSION:
+        raise ValueError(f'{path} is a version {snapshot.get("version")} snapshot, expected version {VERSION}')
+    return snapshot
+
+
+def snapshot_rng(snapshot, seed=None):
+    # Random stream of the snapshot, or a branch of it when a seed is given: the new stream is seeded
+    # from the next bits of the saved one and the seed, so replications from one snapshot differ
+    # and the same seed branched from different snapshots does too
+    rng = random.Random()
+    rng.setstate(snapshot['rng'])
+    if seed is not None:
+        rng.seed(f'{rng.getrandbits(128)}:{seed}')
+    return rng
+
+
+def start_service(p, service, delay):
+    # Unfinished service of a plane at the gate, a process of its own like in Airport.wait_for_service
+    p.services[service.__name__] = p.env.process(service(p, delay))
+
+
+def start_plane(p, phase, phase_end):
+    p.process = p.env.process(p.run(phase, phase_end))
+
+
+def restore_snapshot(snapshot, airports, planes, fleet, keep_statistics=False):
+    # Put freshly created airports and planes (see create_model) in the state of the snapshot
+    # and start their processes in the phase they were saved in
+    # keep_statistics keeps the counters of the warm-up, by default they start again from zero
+    env = airports[0].env
+    if env.now != snapshot['time']:
+        raise ValueError(f'The environment is at time {env.now}, the snapshot at {snapshot["time"]}')
+    by_name = {a.name: a for a in airports}
+    plane_by_name = {p.name: p for p in planes}
+    if set(by_name) != {a['name'] for a in snapshot['airports']} or \
+            set(plane_by_name) != {p['name'] for p in snapshot['planes']}:
+        raise ValueError('The scenario does not have the same airports and planes as the snapshot')
+
+    phases = {state['name']: state['phase'] for state in snapshot['planes']}
+    pool = airports[0].pool
+    for field in POOL_FIELDS:
+        getattr(pool, field).frombytes(snapshot['pool'][field])
+
+    for state in snapshot['planes']:
+        p = plane_by_name[state['name']]
+        p.route = [by_name[name] for name in state['route']]
+        p.set_destination(state['destination'])
+        restore_queue(p.passengers, state['passengers'], by_name)
+        restore_queue(p.cargo, state['cargo'], by_name)
+        p.cargo_space = state['cargo_space']
+        p.runway_requested = state['runway_requested']
+        p.gate_requested = state['gate_requested']
+        p.service_start = state['service_start']
+        p.arrival_time = state['arrival_time']
+        p.flying = state['flying']
+        p.total_delay = state['total_delay']
+        p.fleet = fleet
+        p.fleet_index = fleet.register(p, p.route[p.destination-1].location)
+        origin, target, departure, duration, airborne = state['leg']
+        fleet.depart(p.fleet_index, origin, target, departure, duration)
+        if not airborne:
+            fleet.land(p.fleet_index)
+        if keep_statistics:
+            for field, value in state['counters'].items():
+                setattr(p, field, value)
+
+    for state in snapshot['airports']:
+        a = by_name[state['name']]
+        restore_queue(a.passengers, state['passengers'], by_name)
+        restore_queue(a.cargo, state['cargo'], by_name)
+        a.cargo_space = state['cargo_space']
+        a.current_planes = dict.fromkeys(plane_by_name[name] for name in state['current_planes'])
+        # Ask for the gates and runways again in the saved order, so the same planes get them
+        # and the queues are unchanged
+        for holder, priority in state['gates']:
+            plane_by_name[holder].gate = a.gates.request()
+        a.gate_occupancy.set(a.gates.count)
+        for holder, priority in state['runway']:
+            plane_by_name[holder].runway = a.runway.request(priority=priority)
+            if phases[holder] in ('queued', 'landing_queued'):
+                a.runway_queue_length.add(1)
+        if keep_statistics:
+            for field, value in state['counters'].items():
+                setattr(a, field, value)
+
+    # Restart the processes in the order their pending events were scheduled, each one schedules its
+    # event again on its first step so the new events keep that order. Processes waiting on a resource
+    # have no pending event and start last. [(order, function, arguments), ...]
+    starts = []
+    for state in snapshot['airports']:
+        a = by_name[state['name']]
+        for group, d, rate in a.demand():
+            key = (group, d.name if d is not None else None)
+            starts.append((state['arrival_order'].get(key), a.start_arrival,
+                           (group, d, rate, state['next_arrivals'].get(key))))
+    for state in snapshot['planes']:
+        p = plane_by_name[state['name']]
+        if state['services'] is not None:
+            p.services = {}
+            for service, duration in p.route[p.destination-1].service_steps():
+                if service.__name__ in state['services']:
+                    starts.append((state['services'][service.__name__], start_service,
+                                   (p, service, state['service_start'] + duration - env.now)))
+        starts.append((state['order'], start_plane, (p, state['phase'], state['phase_end'])))
+    starts.sort(key=lambda start: start[0] if start[0] is not None else (math.inf,))
+    for order, function, arguments in starts:
+        function(*arguments)
@@ -0,0 +1,49 @@
+import numpy as np
+
+# Uniform grid index over 2d points, used by the GUI to find the airports inside the viewport.
+# Points are sorted by grid cell once per build, a query then only looks at the cells the
+# rectangle covers, so its cost follows what is inside the rectangle, not the number of points.
+
+
+# Define the SpatialGrid class
+class SpatialGrid:
+    def __init__(self, cell_size):
+        # Side of a square grid cell, in world units
+        self.cell_size = cell_size
+        self.points = np.zeros((0, 2))
+        # Point indexes sorted by cell, and {(cell x, cell y): (start, end)} slices into them
+        self.order = np.zeros(0, dtype=np.intp)
+        self.cells = {}
+
+    def build(self, points):
+        # Index points (n, 2)
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        keys = np.floor(self.points / self.cell_size).astype(np.int64)
+        self.order = np.lexsort((keys[:, 1], keys[:, 0]))
+        keys = keys[self.order]
+        self.cells = {}
+        if len(keys):
+            # Start of every run of equal cells
+            starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+            bounds = np.concatenate(([0], starts, [len(keys)]))
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                self.cells[(int(keys[start, 0]), int(keys[start, 1]))] = (int(start), int(end))
+        return self
+
+    def query(self, x0, y0, x1, y1):
+        # Indexes of the points inside the rectangle, in no particular order
+        size = self.cell_size
+        cx0, cy0 = int(np.floor(x0 / size)), int(np.floor(y0 / size))
+        cx1, cy1 = int(np.floor(x1 / size)), int(np.floor(y1 / size))
+        # A rectangle bigger than the grid walks the occupied cells instead of the covered ones
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            slices = [bounds for (cx, cy), bounds in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            slices = [self.cells[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                      if (cx, cy) in self.cells]
+        if not slices:
+            return np.zeros(0, dtype=np.intp)
+        found = np.concatenate([self.order[start:end] for start, end in slices])
+        points = self.points[found]
+        inside = (points[:, 0] >= x0) & (points[:, 0] <= x1) & (points[:, 1] >= y0) & (points[:, 1] <= y1)
+        return found[inside]
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+# Live state streaming to dashboards in other processes.
+# A simulation process samples the airports and planes and hands the state to an asyncio server
+# running on its own thread, at most rate times per wall clock second. Every subscriber has a
+# bounded queue: when it falls behind the oldest waiting states are dropped, so a slow consumer
+# only misses frames and never holds up env.run.
+#
+# Frames are json lines. The first one a subscriber gets is a full state, the following ones only
+# carry the airports and planes that changed since the frame it was last sent, with only their
+# changed fields, so dropping frames in between keeps the subscriber's copy exact.
+#
+#   python Airport_Simulation_Final.py --headless --until 5000 --stream 8765
+#   python stream.py 8765
+
+
+def plane_state(p, position, airborne):
+    return {
+        'position': [round(float(position[0]), 1), round(float(position[1]), 1)],
+        'airborne': bool(airborne),
+        'phase': p.phase,
+        'route': [a.name for a in p.route],
+        'airport': p.route[p.destination-1].name,
+        'cargo_space': p.cargo_space,
+        'passengers': len(p.passengers),
+    }
+
+
+def airport_state(a):
+    return {
+        'cargo_space': a.cargo_space,
+        'passengers': len(a.passengers),
+        'current_planes': [p.name for p in a.current_planes],
+    }
+
+
+def delta(state, previous):
+    # The entities of state that differ from previous, with only their changed fields
+    changes = {}
+    for group in ('airports', 'planes'):
+        changed = {}
+        for name, fields in state[group].items():
+            before = previous[group].get(name, {})
+            if fields != before:
+                changed[name] = {field: value for field, value in fields.items() if before.get(field) != value}
+        changes[group] = changed
+    return changes
+
+
+def encode(state, previous):
+    # One frame, the full state when the subscriber has nothing yet
+    if previous is None:
+        frame = {'type': 'full', 'seq': state['seq'], 'time': state['time'],
+                 'airports': state['airports'], 'planes': state['planes']}
+    else:
+        frame = {'type': 'delta', 'seq': state['seq'], 'time': state['time'], **delta(state, previous)}
+    return (json.dumps(frame, separators=(',', ':')) + '\n').encode()
+
+
+def apply(state, frame):
+    # Subscriber side: bring state (None before the first frame) up to date with a decoded frame
+    if frame['type'] == 'full':
+        state = {'airports': {}, 'planes': {}}
+    for group in ('airports', 'planes'):
+        for name, fields in frame[group].items():
+            state[group].setdefault(name, {}).update(fields)
+    state['seq'] = frame['seq']
+    state['time'] = frame['time']
+    return state
+
+
+# Define the StateServer class
+class StateServer:
+    def __init__(self, airports, planes, fleet, host='127.0.0.1', port=8765, rate=10, interval=1.0,
+                 queue_size=2):
+        self.airports = airports
+        self.planes = planes
+        self.fleet = fleet
+        self.host = host
+        self.port = port
+        # Most frames published per wall clock second, and simulation time between two checks
+        self.rate = rate
+        self.interval = interval
+        # States waiting for one subscriber before the oldest are dropped
+        self.queue_size = queue_size
+        self.seq = 0
+        self.last_publish = None
+        # Last published state, a new subscriber starts from it
+        self.latest = None
+        # {queue: stream writer} of the connected subscribers, and their tasks
+        self.subscribers = {}
+        self.tasks = set()
+        self.dropped = 0
+        # {(previous seq, seq): frame} for the states queued now, subscribers in step share their frames
+        self.frames = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        # Serve on a thread of its own, returns once the socket is listening
+        ready = threading.Event()
+        failure = []
+
+        def serve():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self.subscribe, self.host, self.port))
+            except OSError as e:
+                failure.append(e)
+                ready.set()
+                self.loop.close()
+                return
+            # Port 0 picks a free port
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=serve, name='state-server', daemon=True)
+        self.thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        return self
+
+    def snapshot(self, now):
+        positions, headings, remaining, airborne = self.fleet.step(now)
+        self.seq += 1
+        return {
+            'seq': self.seq,
+            'time': now,
+            'airports': {a.name: airport_state(a) for a in self.airports},
+            'planes': {p.name: plane_state(p, positions[p.fleet_index], airborne[p.fleet_index])
+                       for p in self.planes},
+        }
+
+    def publish(self, now, force=False):
+        # Called from the simulation, skipped while the last frame is younger than 1 / rate
+        wall = time.monotonic()
+        if not force and self.last_publish is not None and wall - self.last_publish < 1 / self.rate:
+            return
+        self.last_publish = wall
+        self.loop.call_soon_threadsafe(self.broadcast, self.snapshot(now))
+
+    def run(self, env):
+        # Simulation process checking every interval whether a frame is due
+        while True:
+            self.publish(env.now)
+            yield env.timeout(self.interval)
+
+    def broadcast(self, state):
+        # Server thread: queue the state for every subscriber, dropping what a lagging one has not taken yet
+        self.latest = state
+        self.frames = {}
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(state)
+
+    async def subscribe(self, reader, writer):
+        queue = asyncio.Queue(self.queue_size)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self.subscribers[queue] = writer
+        self.tasks.add(asyncio.current_task())
+        sent = None
+        try:
+            while True:
+                state = await queue.get()
+                if state is None:
+                    break
+                key = (sent['seq'] if sent is not None else None, state['seq'])
+                if key not in self.frames:
+                    self.frames[key] = encode(state, sent)
+                writer.write(self.frames[key])
+                sent = state
+                # Waits while the subscriber is slow, meanwhile broadcast drops frames for it
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.subscribers[queue]
+            self.tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def shutdown(self, timeout):
+        self.server.close()
+        for queue in self.subscribers:
+            # The end marker goes in even when the queue is full
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        # Subscribers get timeout seconds to take what is queued, stalled ones are then cut off
+        if self.tasks:
+            await asyncio.wait(list(self.tasks), timeout=timeout)
+        for writer in list(self.subscribers.values()):
+            writer.transport.abort()
+        if self.tasks:
+            await asyncio.wait(list(self.tasks))
+        await self.server.wait_closed()
+
+    def close(self, now=None, timeout=2):
+        # Send the final state when now is given, let subscribers take what is queued and stop the server
+        if self.thread is None:
+            return
+        if now is not None:
+            self.publish(now, force=True)
+        asyncio.run_coroutine_threadsafe(self.shutdown(timeout), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+
+def follow(host='127.0.0.1', port=8765):
+    # Yield the reconstructed full state after every frame received
+    state = None
+    with socket.create_connection((host, port)) as connection:
+        for line in connection.makefile('rb'):
+            state = apply(state, json.loads(line))
+            yield state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Follow the live state of a streaming airport simulation')
+    parser.add_argument('port', type=int)
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args(argv)
+
+    for state in follow(args.host, args.port):
+        airborne = sum(p['airborne'] for p in state['planes'].values())
+        waiting = sum(a['passengers'] for a in state['airports'].values())
+        print(f"#{state['seq']} time {state['time']:.1f}: {airborne}/{len(state['planes'])} planes airborne, "
+              f"{waiting} passengers waiting")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import random
+
+import simpy
+
+from Airport_Simulation_Final import build_simulation, create_model
+from scenario import generate_scenario
+
+
+def scenario(planes, gates=1, runway_policy='fifo'):
+    # Two airports, every plane starts at AP0 and flies to AP1
+    result = generate_scenario(airports=2, planes=planes, seed=1, gates=gates)
+    for airport in result['airports']:
+        airport['runway_policy'] = runway_policy
+    for plane in result['planes']:
+        plane['route'] = ['AP0', 'AP1']
+    return result
+
+
+def test_gates_service_planes_at_the_same_time():
+    for gates in (1, 2):
+        env = simpy.Environment()
+        airports, planes = build_simulation(env, None, scenario(2, gates), random.Random(1))
+        env.run(until=1)
+        assert [p.phase for p in planes].count('servicing') == gates
+        assert airports[0].gates.count == gates
+        env.run(until=30)
+        assert planes[0].phase == 'flying'
+        assert all(p.gate_requests == 1 for p in planes)
+        if gates == 1:
+            # The second plane waited at the gate for the whole service of the first one
+            service = max(duration for step, duration in airports[0].service_steps())
+            assert planes[1].gate_wait == service
+            assert planes[1].phase == 'servicing'
+        else:
+            assert planes[1].gate_wait == 0
+            assert planes[1].phase != 'servicing'
+
+
+def runway_order(policy, requests):
+    # Names of the planes queueing for the single runway of AP0, in the order they will get it
+    # requests is [(delay so far, landing)], one plane each, asking in that order while the runway is held
+    env = simpy.Environment()
+    airports, planes = create_model(env, None, scenario(len(requests), runway_policy=policy))
+    airport = airports[0]
+    airport.runway.request()
+    for p, (delay, landing) in zip(planes, requests):
+        p.total_delay = delay
+        p.request_runway(airport, landing)
+    owners = {p.runway: p.name for p in planes}
+    return [owners[r] for r in airport.runway.queue]
+
+
+REQUESTS = [(30, False), (10, True), (20, False), (0, True)]
+
+
+def test_fifo_keeps_request_order():
+    assert runway_order('fifo', REQUESTS) == ['Plane1', 'Plane2', 'Plane3', 'Plane4']
+
+
+def test_landings_first_then_request_order():
+    assert runway_order('landings_first', REQUESTS) == ['Plane2', 'Plane4', 'Plane1', 'Plane3']
+
+
+def test_delay_policies_order_by_time_lost():
+    assert runway_order('fewest_delay', REQUESTS) == ['Plane4', 'Plane2', 'Plane3', 'Plane1']
+    assert runway_order('most_delay', REQUESTS) == ['Plane1', 'Plane3', 'Plane2', 'Plane4']
+    # Equal delays keep the request order
+    assert runway_order('fewest_delay', [(5, False), (5, True), (0, False)]) == ['Plane3', 'Plane1', 'Plane2']
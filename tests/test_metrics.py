@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+
+from metrics import Histogram, QuantileSketch
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(3, 1.5) for i in range(20000)]
+    for accuracy in (0.01, 0.05):
+        sketch = QuantileSketch(accuracy)
+        for x in values:
+            sketch.add(x)
+        for q in QUANTILES:
+            # The sketch answers with the item at rank q * (count - 1), rounded down
+            expected = np.quantile(values, q, method='lower')
+            assert abs(sketch.quantile(q) - expected) <= accuracy * expected
+
+
+def test_sketch_counts_zero_and_negative_values():
+    sketch = QuantileSketch()
+    for x in [-3, 0, 0, 5, 10]:
+        sketch.add(x)
+    assert sketch.quantile(0.5) == 0.0
+    assert abs(sketch.quantile(1.0) - 10) <= 0.01 * 10
+
+
+def test_folded_sketch_keeps_high_quantiles():
+    rng = random.Random(2)
+    values = [rng.lognormvariate(0, 1) for i in range(20000)]
+    sketch = QuantileSketch(0.01, max_buckets=256)
+    for x in values:
+        sketch.add(x)
+    assert sketch.folded
+    assert len(sketch.buckets) <= 256
+    assert sketch.count == len(values)
+    assert sum(sketch.buckets.values()) == len(values)
+    # Only the lowest values were folded together
+    for q in (0.9, 0.99):
+        expected = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected
+    assert sketch.quantile(0.0) <= np.quantile(values, 0.5)
+
+
+def test_histogram_quantiles_stay_within_observed_range():
+    histogram = Histogram(0.05)
+    histogram.observe_many([10.0, 10.0, 10.0])
+    summary = histogram.summary(0)
+    assert summary['min'] == summary['max'] == 10.0
+    for name in ('p50', 'p90', 'p99'):
+        assert summary[name] == 10.0
+    assert Histogram().summary(0)['p50'] is None
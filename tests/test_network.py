@@ -0,0 +1,46 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from network import AirportNetwork
+
+
+def random_network(n, seed):
+    rng = random.Random(seed)
+    airports = [SimpleNamespace(name=f'AP{i}', location=[rng.uniform(0, 1000), rng.uniform(0, 1000)])
+                for i in range(n)]
+    return AirportNetwork(airports)
+
+
+def floyd_warshall(distance, max_leg):
+    cost = np.where(distance <= max_leg, distance, np.inf)
+    for k in range(len(cost)):
+        cost = np.minimum(cost, cost[:, k, None] + cost[None, k, :])
+    return cost
+
+
+def test_shortest_path_matches_floyd_warshall():
+    network = random_network(9, 1)
+    for max_leg in (250, 400, 600, None):
+        expected = floyd_warshall(network.distance, np.inf if max_leg is None else max_leg)
+        for origin in network.airports:
+            for target in network.airports:
+                path = network.shortest_path(origin, target, max_leg)
+                if expected[origin.index, target.index] == np.inf:
+                    assert path is None
+                    continue
+                assert path[0] is origin and path[-1] is target
+                legs = [network.leg_distance(a, b) for a, b in zip(path, path[1:])]
+                assert max_leg is None or max(legs, default=0) <= max_leg
+                assert np.isclose(network.route_cost(path), expected[origin.index, target.index])
+    # Some pairs are out of reach with the shortest legs, the test covers both answers
+    assert np.isinf(floyd_warshall(network.distance, 250)).any()
+
+
+def test_sample_route_does_not_repeat_airports():
+    network = random_network(9, 2)
+    rng = random.Random(3)
+    for length in (2, 5, 9):
+        route = network.sample_route(rng, length, max_leg=300)
+        assert len({a.name for a in route}) == len(route) == length
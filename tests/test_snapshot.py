@@ -0,0 +1,65 @@
+import random
+
+import pytest
+import simpy
+
+from Airport_Simulation_Final import DEFAULT_SCENARIO, build_simulation, resume_simulation
+from event_log import DEBUG, EventLog
+from replication import kpis
+from scenario import generate_scenario
+from snapshot import load_snapshot, save_snapshot
+
+UNTIL = 300
+
+
+def uninterrupted(scenario, seed):
+    env = simpy.Environment()
+    log = EventLog(default_level=DEBUG, capacity=1 << 20)
+    airports, planes = build_simulation(env, log, scenario, random.Random(seed))
+    env.run(until=UNTIL)
+    return log.records(), kpis(airports, planes, UNTIL)
+
+
+def resumed(scenario, seed, at, path, keep_statistics=True):
+    env = simpy.Environment()
+    airports, planes = build_simulation(env, None, scenario, random.Random(seed))
+    env.run(until=at)
+    save_snapshot(path, env, airports, planes, UNTIL)
+
+    env = simpy.Environment(initial_time=at)
+    log = EventLog(default_level=DEBUG, capacity=1 << 20)
+    airports, planes = resume_simulation(env, load_snapshot(path), log, keep_statistics=keep_statistics)
+    env.run(until=UNTIL)
+    return log.records(), kpis(airports, planes, UNTIL)
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+@pytest.mark.parametrize('at', [100.5, 137.25])
+def test_resume_matches_uninterrupted_run(tmp_path, seed, at):
+    records, expected = uninterrupted(DEFAULT_SCENARIO, seed)
+    resumed_records, result = resumed(DEFAULT_SCENARIO, seed, at, tmp_path / 'run.snap')
+    assert result == expected
+    assert resumed_records == [r for r in records if r.time >= at]
+
+
+@pytest.mark.parametrize('at', [20, 22, 44])
+def test_resume_keeps_order_of_events_at_snapshot_time(tmp_path, at):
+    # Planes start together and service times are whole numbers, many events fall on the snapshot time
+    scenario = generate_scenario(airports=12, planes=20, seed=3, gates=2)
+    records, expected = uninterrupted(scenario, 1)
+    assert any(r.time == at for r in records)
+    resumed_records, result = resumed(scenario, 1, at, tmp_path / 'run.snap')
+    assert result == expected
+    assert resumed_records == [r for r in records if r.time >= at]
+
+
+@pytest.mark.parametrize('policy', ['fewest_delay', 'most_delay'])
+def test_resume_keeps_runway_order_without_statistics(tmp_path, policy):
+    # The delays these policies order runways by are model state, they survive a resume that drops
+    # the warm-up counters
+    scenario = generate_scenario(airports=3, planes=20, width=300, height=300, gates=4, seed=4)
+    for airport in scenario['airports']:
+        airport['runway_policy'] = policy
+    records, expected = uninterrupted(scenario, 1)
+    resumed_records, result = resumed(scenario, 1, 150, tmp_path / 'run.snap', keep_statistics=False)
+    assert resumed_records == [r for r in records if r.time >= 150]
@@ -0,0 +1,116 @@
+from Airport_Simulation_Final import CargoIndex, CargoQueue, HandleQueue, ItemPool
+from event_log import CARGO, PASSENGER
+
+
+def spawn(pool, store, destination, sizes, start=0):
+    # One item per size, a time unit apart, returns their handles
+    handles = []
+    for i, size in enumerate(sizes):
+        h = pool.new(CARGO, 0, size, start + i)
+        store.append(destination, h, size)
+        handles.append(h)
+    return handles
+
+
+def test_pool_reuses_released_handles():
+    pool = ItemPool()
+    handles = [pool.new(PASSENGER, 1, 1, t) for t in range(4)]
+    assert handles == [0, 1, 2, 3]
+    assert len(pool) == 4
+
+    pool.release([1, 3])
+    assert len(pool) == 2
+    # Freed handles are handed out again before the arrays grow, with their fields overwritten
+    reused = {pool.new(CARGO, 7, 5, 10.0), pool.new(CARGO, 8, 6, 11.0)}
+    assert reused == {1, 3}
+    assert len(pool.group) == 4
+    assert len(pool) == 4
+    for h in reused:
+        assert pool.group[h] == CARGO
+        assert pool.destination[h] in (7, 8)
+    assert pool.total_size([1, 3]) == 11
+    assert pool.new(PASSENGER, 0, 1, 12.0) == 4
+
+
+def test_handle_queue_keeps_order_through_compaction():
+    queue = HandleQueue()
+    queue.items.extend(range(3000))
+    assert list(queue.take(1600)) == list(range(1600))
+    # More than half the array had left, it was compacted
+    assert queue.head == 0
+    assert queue.peek() == 1600
+    assert queue.popleft() == 1600
+    assert len(queue) == 1399
+
+
+def test_cargo_queue_accounting():
+    pool = ItemPool()
+    queue = CargoQueue(pool)
+    a = spawn(pool, queue, 'A', [2, 3, 4])
+    spawn(pool, queue, 'B', [5])
+    assert (len(queue), queue.space) == (4, 14)
+    assert queue.waiting('A') == 3
+    assert queue.waiting('C') == 0
+
+    handles, space = queue.take('A', 2)
+    assert list(handles) == a[:2]
+    assert space == 5
+    assert queue.popleft('A') == a[2]
+    assert (len(queue), queue.space) == (1, 5)
+    assert len(queue.pop_destination('B')) == 1
+    assert (len(queue), queue.space) == (0, 0)
+    assert list(queue.contents()) == []
+
+
+def test_load_oldest_first_then_best_fit():
+    pool = ItemPool()
+    index = CargoIndex(pool)
+    h4, h3, h2, h1 = spawn(pool, index, 'A', [4, 3, 2, 1])
+
+    # The oldest item (4) fits, then only the 1 still fits in what is left
+    loaded = index.load(['A'], 5)
+    assert list(loaded['A'][0]) == [h4, h1]
+    assert loaded['A'][1] == 5
+    assert index.waiting('A') == 2
+    assert (len(index), index.space) == (2, 5)
+
+
+def test_load_takes_largest_fit_when_oldest_does_not_fit():
+    pool = ItemPool()
+    index = CargoIndex(pool)
+    h4, h3a, h2, h3b = spawn(pool, index, 'A', [4, 3, 2, 3])
+
+    # 4 does not fit, the largest size that does is 3 and its oldest item goes first
+    loaded = index.load(['A'], 3)
+    assert list(loaded['A'][0]) == [h3a]
+    # Then oldest first again while the items fit
+    loaded = index.load(['A'], 7)
+    assert list(loaded['A'][0]) == [h4, h2]
+    assert [h for d, handles in index.contents() for h in handles] == [h3b]
+
+
+def test_load_never_exceeds_space():
+    pool = ItemPool()
+    index = CargoIndex(pool)
+    spawn(pool, index, 'A', [5, 5, 5])
+    assert index.load(['A'], 4) == {}
+    assert (len(index), index.space) == (3, 15)
+    loaded = index.load(['A'], 12)
+    assert loaded['A'][1] == 10
+    assert index.waiting('A') == 1
+
+
+def test_load_only_takes_requested_destinations():
+    pool = ItemPool()
+    index = CargoIndex(pool)
+    a = spawn(pool, index, 'A', [2, 2])
+    b = spawn(pool, index, 'B', [1], start=0.5)
+    c = spawn(pool, index, 'C', [1])
+
+    loaded = index.load(['A', 'B'], 10)
+    assert list(loaded['A'][0]) == a
+    assert list(loaded['B'][0]) == b
+    assert 'C' not in loaded
+    assert index.waiting('A') == index.waiting('B') == 0
+    assert [(d, list(handles)) for d, handles in index.contents()] == [('C', c)]
+    assert (len(index), index.space) == (1, 1)
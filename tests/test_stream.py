@@ -0,0 +1,41 @@
+import json
+import random
+
+import simpy
+
+from Airport_Simulation_Final import DEFAULT_SCENARIO, build_simulation
+from stream import StateServer, apply, delta, encode
+
+
+def states(scenario, seed, times):
+    # The states a server would publish at the given times, without starting it
+    env = simpy.Environment()
+    airports, planes = build_simulation(env, None, scenario, random.Random(seed))
+    server = StateServer(airports, planes, planes[0].fleet)
+    result = []
+    for t in times:
+        env.run(until=t)
+        result.append(server.snapshot(env.now))
+    return result
+
+
+def test_delta_only_carries_changed_fields():
+    previous = {'airports': {'A': {'passengers': 3, 'cargo_space': 5}}, 'planes': {'P': {'phase': 'flying'}}}
+    state = {'airports': {'A': {'passengers': 4, 'cargo_space': 5}}, 'planes': {'P': {'phase': 'flying'}}}
+    assert delta(state, previous) == {'airports': {'A': {'passengers': 4}}, 'planes': {}}
+
+
+def test_subscriber_skipping_frames_ends_with_the_full_state():
+    published = states(DEFAULT_SCENARIO, 1, range(5, 400, 5))
+    # The subscriber is only sent some of the states, its queue dropped the others
+    sent = [published[i] for i in (0, 1, 4, 5, 6, 13, 30, 31, 50, len(published) - 1)]
+    state = previous = None
+    for s in sent:
+        frame = json.loads(encode(s, previous))
+        assert frame['type'] == ('full' if previous is None else 'delta')
+        state = apply(state, frame)
+        previous = s
+        # The json round trip leaves what the subscriber holds equal to the published state
+        assert state == json.loads(json.dumps(s))
+    assert state['seq'] == published[-1]['seq']
+    assert len(encode(published[-1], sent[-2])) < len(encode(published[-1], None))
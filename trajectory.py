@@ -0,0 +1,160 @@
+import json
+import struct
+
+import numpy as np
+
+# Trajectory recording for offline replay.
+# A recorder process samples plane positions and the load of every airport and plane each
+# interval of simulation time into a file of fixed size records. Records are written and read
+# through numpy memory maps of a bounded window, so hours of simulation are recorded and
+# replayed (see replay.py) with constant memory.
+#
+# File layout: MAGIC, PREFIX ("<I" header length, "<Q" record count), the json header
+# padded to a multiple of 8 bytes, then the records (see record_dtype)
+
+MAGIC = b'ATRJ\x01'
+PREFIX = struct.Struct('<IQ')
+# Records mapped at once by the writer, the file grows by this much when they are used up
+CHUNK = 4096
+
+# Bits of plane_flags
+AIRBORNE = 1
+# The plane flies its route back to front, as in Plane.route after it turned back
+REVERSED = 2
+
+
+def record_dtype(airports, planes):
+    # One sample of the whole simulation
+    return np.dtype([
+        ('time', '<f8'),
+        ('plane_position', '<f4', (planes, 2)),
+        ('plane_flags', 'u1', (planes,)),
+        # Network index of the airport the plane is at or last left
+        ('plane_airport', '<i4', (planes,)),
+        ('plane_cargo', '<i4', (planes,)),
+        ('plane_passengers', '<i4', (planes,)),
+        ('airport_planes', '<i4', (airports,)),
+        ('airport_cargo', '<i4', (airports,)),
+        ('airport_passengers', '<i4', (airports,)),
+    ])
+
+
+def data_offset(header_length):
+    # Records start on a multiple of 8 bytes
+    offset = len(MAGIC) + PREFIX.size + header_length
+    return offset + (-offset) % 8
+
+
+# Define the TrajectoryRecorder class
+class TrajectoryRecorder:
+    def __init__(self, path, airports, planes, fleet, interval=1.0):
+        self.path = path
+        self.airports = airports
+        self.planes = planes
+        self.fleet = fleet
+        # Simulation time between two samples
+        self.interval = interval
+        # Fleet slot and initial route of every plane, routes as network indexes
+        self.slots = [p.fleet_index for p in planes]
+        self.routes = [[a.index for a in p.route] for p in planes]
+        self.header = json.dumps({
+            'interval': interval,
+            'airports': [{'name': a.name, 'location': list(a.location), 'cargo_capacity': a.cargo_capacity,
+                          'passenger_capacity': a.passenger_capacity} for a in airports],
+            'planes': [{'name': p.name, 'cargo_capacity': p.cargo_capacity, 'passenger_capacity': p.passenger_capacity,
+                        'route': route} for p, route in zip(planes, self.routes)],
+        }).encode()
+        self.dtype = record_dtype(len(airports), len(planes))
+        self.offset = data_offset(len(self.header))
+        # Records written, and the mapped window [window_start, window_start + CHUNK) they go into
+        self.count = 0
+        self.window_start = 0
+        self.window = None
+        with open(path, 'wb') as f:
+            f.write(MAGIC + PREFIX.pack(len(self.header), 0) + self.header)
+            f.write(b'\0' * (self.offset - f.tell()))
+        self.map_window()
+
+    def map_window(self):
+        # Grow the file and map the next CHUNK records
+        if self.window is not None:
+            self.flush()
+        self.window_start = self.count
+        with open(self.path, 'r+b') as f:
+            f.truncate(self.offset + (self.count + CHUNK) * self.dtype.itemsize)
+        self.window = np.memmap(self.path, self.dtype, 'r+', self.offset + self.count * self.dtype.itemsize,
+                                shape=(CHUNK,))
+
+    def flush(self):
+        self.window.flush()
+        with open(self.path, 'r+b') as f:
+            f.seek(len(MAGIC))
+            f.write(PREFIX.pack(len(self.header), self.count))
+
+    def sample(self, now):
+        if self.count - self.window_start == CHUNK:
+            self.map_window()
+        record = self.window[self.count - self.window_start]
+        positions, headings, remaining, airborne = self.fleet.step(now)
+        record['time'] = now
+        record['plane_position'] = positions[self.slots]
+        record['plane_flags'] = [AIRBORNE * bool(airborne[i]) | REVERSED * (p.route[0].index != route[0])
+                                 for i, p, route in zip(self.slots, self.planes, self.routes)]
+        record['plane_airport'] = [p.route[p.destination-1].index for p in self.planes]
+        record['plane_cargo'] = [p.cargo_space for p in self.planes]
+        record['plane_passengers'] = [len(p.passengers) for p in self.planes]
+        record['airport_planes'] = [len(a.current_planes) for a in self.airports]
+        record['airport_cargo'] = [a.cargo_space for a in self.airports]
+        record['airport_passengers'] = [len(a.passengers) for a in self.airports]
+        self.count += 1
+
+    def run(self, env):
+        # Simulation process taking a sample every interval
+        while True:
+            self.sample(env.now)
+            yield env.timeout(self.interval)
+
+    def close(self):
+        # Drop the unused end of the last window
+        self.flush()
+        self.window = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(self.offset + self.count * self.dtype.itemsize)
+
+
+# Define the Trajectory class, a recorded file opened for reading
+class Trajectory:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a trajectory file')
+            header_length, count = PREFIX.unpack(f.read(PREFIX.size))
+            self.header = json.loads(f.read(header_length))
+        self.interval = self.header['interval']
+        self.dtype = record_dtype(len(self.header['airports']), len(self.header['planes']))
+        if count == 0:
+            raise ValueError(f'{path} has no records')
+        # Only the pages of the records looked at are read from disk
+        self.records = np.memmap(path, self.dtype, 'r', data_offset(header_length), shape=(count,))
+        self.start = float(self.records[0]['time'])
+        self.end = float(self.records[-1]['time'])
+
+    def __len__(self):
+        return len(self.records)
+
+    def index(self, t):
+        # Record at or before time t, samples are interval apart
+        return min(max(int((t - self.start) / self.interval), 0), len(self.records) - 1)
+
+    def frame(self, t):
+        # The record at or before t, and the plane positions moved on towards the next record
+        position = (t - self.start) / self.interval
+        i = self.index(t)
+        record = self.records[i]
+        positions = record['plane_position'].astype(float)
+        if i + 1 < len(self.records):
+            following = self.records[i + 1]
+            moving = (record['plane_flags'] & following['plane_flags'] & AIRBORNE).astype(bool)
+            fraction = min(max(position - i, 0), 1)
+            positions[moving] += (following['plane_position'][moving] - positions[moving]) * fraction
+        return record, positions